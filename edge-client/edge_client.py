@@ -5,30 +5,104 @@ Runs TensorFlow Lite models on edge devices for real-time health monitoring
 with federated learning capabilities.
 """
 
+import os
 import json
+import base64
+import hashlib
+import asyncio
 import time
 import threading
-import queue
+import signal
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 import numpy as np
+import orjson
 import requests
-from cryptography.fernet import Fernet
+import zstandard as zstd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 import schedule
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 try:
     import tflite_runtime.interpreter as tflite
+    load_delegate = tflite.load_delegate
 except ImportError:
     import tensorflow.lite as tflite
+    load_delegate = tflite.experimental.load_delegate
 
 from sensors.heart_rate_sensor import HeartRateSensor
 from sensors.spo2_sensor import SpO2Sensor  
 from sensors.activity_sensor import ActivitySensor
 from federated.model_updater import FederatedModelUpdater
-from utils.encryption import EncryptionManager
 from utils.logger import setup_logger
 
+# Model file stem per sensor
+MODEL_FILES = {
+    'heart_rate': 'heart_rate_anomaly',
+    'spo2': 'spo2_prediction',
+    'activity': 'activity_recognition'
+}
+
+# Shared libraries for hardware-accelerated TFLite delegates
+DELEGATE_LIBRARIES = {
+    'nnapi': 'libnnapi_delegate.so',
+    'gpu': 'libtensorflowlite_gpu_delegate.so',
+    'hexagon': 'libhexagon_delegate.so'
+}
+
+# Activity model output classes, in output order
+ACTIVITY_LABELS = ('resting', 'walking', 'running', 'sleeping')
+
+# Prediction thresholds
+ANOMALY_THRESHOLD = 0.5
+CRITICAL_SPO2 = 90.0
+
+
+if NUMBA_AVAILABLE:
+    # Explicit signatures compile (or load from the on-disk cache) at import,
+    # so the first sensor sample does not pay the JIT cost
+    @njit(['void(float32[::1], int8[::1], float64, int64, int64, int64)',
+           'void(float32[::1], uint8[::1], float64, int64, int64, int64)'],
+          cache=True, nogil=True, fastmath=True)
+    def _quantize_into(src, dst, scale, zero_point, qmin, qmax):
+        """Quantize float samples into a preallocated integer input buffer"""
+        for i in range(dst.size):
+            q = round(src[i] / scale) + zero_point
+            dst[i] = min(max(q, qmin), qmax)
+    
+    @njit('void(float32[::1], float32[::1])', cache=True, nogil=True, fastmath=True)
+    def _copy_into(src, dst):
+        """Copy float samples into a preallocated float input buffer"""
+        for i in range(dst.size):
+            dst[i] = src[i]
+else:
+    def _quantize_into(src, dst, scale, zero_point, qmin, qmax):
+        """Quantize float samples into a preallocated integer input buffer"""
+        dst[:] = np.clip(np.round(src / scale) + zero_point, qmin, qmax)
+    
+    def _copy_into(src, dst):
+        """Copy float samples into a preallocated float input buffer"""
+        dst[:] = src
+
+
+def _prewarm():
+    """Run each input kernel once so dispatch is warm before the first sample"""
+    src = np.zeros(1, dtype=np.float32)
+    _copy_into(src, np.empty(1, dtype=np.float32))
+    _quantize_into(src, np.empty(1, dtype=np.int8), 1.0, 0, -128, 127)
+    _quantize_into(src, np.empty(1, dtype=np.uint8), 1.0, 0, 0, 255)
+
+
 class EdgeHealthMonitor:
     """Main edge client for health monitoring with federated learning"""
     
@@ -36,19 +110,61 @@ class EdgeHealthMonitor:
         """Initialize the edge health monitor"""
         self.config = self._load_config(config_path)
         self.logger = setup_logger(self.config.get('log_level', 'INFO'))
+        self._debug = self.logger.isEnabledFor(logging.DEBUG)
         
         # Initialize components
         self.sensors = self._initialize_sensors()
         self.models = self._load_models()
+        _prewarm()
+        
+        # Cached tensor details, views and quantization parameters per model
+        self._model_io = {}
+        self._pipelines = {}
+        # Held around invokes so model swaps wait for in-flight inference
+        self._models_lock = threading.Lock()
+        for sensor_name, model in self.models.items():
+            self._prepare_model(sensor_name, model)
+        
         self.federated_updater = FederatedModelUpdater(self.config)
-        self.encryption_manager = EncryptionManager(self.config.get('encryption_key'))
+        self.cipher = self._create_cipher()
+        
+        # Persistent compressor context for batch payloads
+        self._zctx = zstd.ZstdCompressor(level=3)
+        
+        # Persistent HTTP session so TCP/TLS connections are reused across batches
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=4,
+            max_retries=Retry(total=3, backoff_factor=0.5)
+        )
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+        self._http.headers.update({
+            'Content-Type': 'application/json',
+            'Connection': 'keep-alive'
+        })
+        
+        # Samples are timestamped with the monotonic clock (int64 ns); this offset
+        # converts them to wall-clock time once per transmitted batch
+        self._wall_clock_offset_ns = time.time_ns() - time.monotonic_ns()
+        
+        # Per-sensor sample rings (timestamps and data as parallel arrays),
+        # allocated on the first sample once the sample shape is known
+        self._ring_capacity = self.config.get('sensor_ring_capacity', 1000)
+        self._rings = {}
+        self._sensor_cv = threading.Condition()
+        
+        # Bounded ring buffer for results (oldest items are dropped when full)
+        self.results_ring = deque(maxlen=100)
+        self._results_cv = threading.Condition()
         
-        # Data queues for processing
-        self.sensor_data_queue = queue.Queue(maxsize=1000)
-        self.inference_results_queue = queue.Queue(maxsize=100)
+        # Optional core assignment, e.g. {"inference": 3, "sensors": [1, 2]}
+        self._cpu_pinning = self.config.get('cpu_pinning', {})
         
         # Control flags
         self.running = False
+        self._stop_event = threading.Event()
         self.threads = []
         
         self.logger.info("Edge Health Monitor initialized successfully")
@@ -62,6 +178,29 @@ class EdgeHealthMonitor:
         except Exception as e:
             raise RuntimeError(f"Failed to load config from {config_path}: {e}")
     
+    def _create_cipher(self) -> AESGCM:
+        """Create the AES-256-GCM cipher for batch payloads"""
+        key = self.config.get('encryption_key') or self.config.get('encryption', {}).get('key')
+        if not key:
+            raise RuntimeError("No encryption key configured")
+        
+        # Derive a 256-bit key from the shared secret
+        return AESGCM(hashlib.sha256(key.encode('utf-8')).digest())
+    
+    def _encrypt_batch(self, batch: List[Dict]) -> str:
+        """Serialize, compress and encrypt a batch; returns base64 of nonce || ciphertext"""
+        batch_bytes = orjson.dumps(batch, option=orjson.OPT_SERIALIZE_NUMPY)
+        
+        # Compress before encrypting (ciphertext does not compress)
+        batch_bytes = self._zctx.compress(batch_bytes)
+        
+        # Fresh 96-bit nonce per batch, device id bound as associated data
+        nonce = os.urandom(12)
+        aad = str(self.config.get('device_id')).encode('utf-8')
+        ciphertext = self.cipher.encrypt(nonce, batch_bytes, aad)
+        
+        return base64.b64encode(nonce + ciphertext).decode('ascii')
+    
     def _initialize_sensors(self) -> Dict:
         """Initialize all health monitoring sensors"""
         sensors = {}
@@ -74,7 +213,8 @@ class EdgeHealthMonitor:
             
             if self.config.get('sensors', {}).get('spo2', {}).get('enabled', False):
                 sensors['spo2'] = SpO2Sensor(
-                    i2c_address=self.config['sensors']['spo2']['i2c_address']
+                    i2c_address=self.config['sensors']['spo2']['i2c_address'],
+                    sample_interval=self.config.get('sensor_sampling_interval', 1.0)
                 )
             
             if self.config.get('sensors', {}).get('activity', {}).get('enabled', False):
@@ -95,23 +235,24 @@ class EdgeHealthMonitor:
         model_dir = Path(self.config.get('model_dir', 'models'))
         
         try:
-            # Load heart rate anomaly detection model
-            hr_model_path = model_dir / 'heart_rate_anomaly.tflite'
-            if hr_model_path.exists():
-                models['heart_rate'] = tflite.Interpreter(model_path=str(hr_model_path))
-                models['heart_rate'].allocate_tensors()
-            
-            # Load SpO2 trend prediction model
-            spo2_model_path = model_dir / 'spo2_prediction.tflite'
-            if spo2_model_path.exists():
-                models['spo2'] = tflite.Interpreter(model_path=str(spo2_model_path))
-                models['spo2'].allocate_tensors()
+            # Heart rate anomaly detection, SpO2 trend prediction and activity recognition
+            # Full-integer models are used when quantized inference is enabled
+            suffix = '_int8' if self.config.get('quantized', False) else ''
+            use_edgetpu = self.config.get('delegate') == 'edgetpu'
             
-            # Load activity recognition model
-            activity_model_path = model_dir / 'activity_recognition.tflite'
-            if activity_model_path.exists():
-                models['activity'] = tflite.Interpreter(model_path=str(activity_model_path))
-                models['activity'].allocate_tensors()
+            for sensor_name, model_file in MODEL_FILES.items():
+                # Prefer models compiled for the Coral Edge TPU when it is selected
+                edgetpu_path = model_dir / f'{model_file}_edgetpu.tflite'
+                if use_edgetpu and edgetpu_path.exists():
+                    try:
+                        models[sensor_name] = self._create_edgetpu_interpreter(edgetpu_path)
+                        continue
+                    except (ImportError, ValueError, RuntimeError) as e:
+                        self.logger.warning(f"Failed to load Edge TPU model {edgetpu_path.name}: {e}")
+                
+                model_path = model_dir / f'{model_file}{suffix}.tflite'
+                if model_path.exists():
+                    models[sensor_name] = self._create_interpreter(model_path)
             
             self.logger.info(f"Loaded {len(models)} TensorFlow Lite models")
             return models
@@ -120,19 +261,125 @@ class EdgeHealthMonitor:
             self.logger.error(f"Failed to load models: {e}")
             return {}
     
+    def _create_interpreter(self, model_path: Path):
+        """Create an interpreter on the configured delegate, falling back to CPU
+        
+        Models are always loaded by path: TFLite maps the flatbuffer read-only,
+        so weights are backed by the shared page cache instead of being copied.
+        """
+        delegate_name = self.config.get('delegate', 'xnnpack')
+        self._prefetch_model(model_path)
+        
+        if delegate_name in DELEGATE_LIBRARIES:
+            try:
+                # Run the graph on the NPU/GPU/DSP when the delegate is available
+                delegate = load_delegate(DELEGATE_LIBRARIES[delegate_name])
+                interpreter = tflite.Interpreter(
+                    model_path=str(model_path),
+                    experimental_delegates=[delegate]
+                )
+                interpreter.allocate_tensors()
+                return interpreter
+                
+            except (ValueError, RuntimeError, OSError) as e:
+                self.logger.warning(f"Failed to load {delegate_name} delegate for {model_path.name}: {e}")
+                self.logger.info("Falling back to CPU (XNNPACK) kernels")
+        
+        # Default CPU kernels use XNNPACK across all cores
+        interpreter = tflite.Interpreter(
+            model_path=str(model_path),
+            num_threads=os.cpu_count()
+        )
+        interpreter.allocate_tensors()
+        return interpreter
+    
+    def _create_edgetpu_interpreter(self, model_path: Path):
+        """Create an interpreter bound to the Coral Edge TPU
+        
+        The TPU keeps the model weights resident for the lifetime of the
+        interpreter, so it is created once and reused for every invoke.
+        """
+        from pycoral.utils.edgetpu import make_interpreter
+        
+        interpreter = make_interpreter(str(model_path))
+        interpreter.allocate_tensors()
+        return interpreter
+    
+    def _prefetch_model(self, model_path: Path):
+        """Ask the kernel to read the model file ahead so first invokes don't fault it in"""
+        if not hasattr(os, 'posix_fadvise'):
+            return
+        
+        try:
+            fd = os.open(model_path, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            self.logger.debug(f"Could not prefetch {model_path.name}: {e}")
+    
+    def _prepare_model(self, sensor_name: str, model):
+        """Cache tensor details and views for a loaded model
+        
+        Details are queried once here so the inference path never walks
+        the interpreter state through get_input_details/get_output_details.
+        """
+        input_detail = model.get_input_details()[0]
+        output_detail = model.get_output_details()[0]
+        dtype = input_detail['dtype']
+        
+        if dtype in (np.uint8, np.int8):
+            scale, zero_point = input_detail['quantization']
+            info = np.iinfo(dtype)
+            quant = (float(scale), int(zero_point), int(info.min), int(info.max))
+        else:
+            quant = None
+        
+        self._model_io[sensor_name] = {
+            'interp': model,
+            'in': input_detail,
+            'out': output_detail,
+            # Input shape is batch-first; 'batch' tracks the allocated batch dimension
+            'in_shape': tuple(input_detail['shape']),
+            'batch': int(input_detail['shape'][0]),
+            'batchable': True,
+            # tensor() returns callables yielding views into the interpreter arena
+            'in_view': model.tensor(input_detail['index']),
+            'out_view': model.tensor(output_detail['index']),
+            'quant': quant
+        }
+        self._pipelines[sensor_name] = self._build_pipeline(sensor_name, self._model_io[sensor_name])
+        self._warmup_model(sensor_name)
+    
+    def _warmup_model(self, sensor_name: str):
+        """Run one invoke on zeros before the first real sample
+        
+        This uploads weights to accelerators and pages in the tensor arena,
+        so the first sensor batch does not pay for it.
+        """
+        io = self._model_io[sensor_name]
+        try:
+            input_buf = io['in_view']()
+            input_buf.fill(0)
+            del input_buf
+            io['interp'].invoke()
+        except (ValueError, RuntimeError) as e:
+            self.logger.warning(f"Warmup invoke failed for {sensor_name} model: {e}")
+    
     def start_monitoring(self):
         """Start the health monitoring system"""
         self.running = True
+        self._stop_event.clear()
         
-        # Start sensor data collection threads
-        for sensor_name, sensor in self.sensors.items():
-            thread = threading.Thread(
-                target=self._sensor_data_collector,
-                args=(sensor_name, sensor),
-                daemon=True
-            )
-            thread.start()
-            self.threads.append(thread)
+        # Start a single sensor polling thread for all sensors
+        sensor_thread = threading.Thread(
+            target=self._sensor_poll_loop,
+            daemon=True
+        )
+        sensor_thread.start()
+        self.threads.append(sensor_thread)
+        self._pin_thread(sensor_thread, self._cpu_pinning.get('sensors'))
         
         # Start inference thread
         inference_thread = threading.Thread(
@@ -141,6 +388,7 @@ class EdgeHealthMonitor:
         )
         inference_thread.start()
         self.threads.append(inference_thread)
+        self._pin_thread(inference_thread, self._cpu_pinning.get('inference'))
         
         # Start data transmission thread
         transmission_thread = threading.Thread(
@@ -149,6 +397,7 @@ class EdgeHealthMonitor:
         )
         transmission_thread.start()
         self.threads.append(transmission_thread)
+        self._pin_thread(transmission_thread, self._cpu_pinning.get('transmission'))
         
         # Schedule federated learning updates
         schedule.every(self.config.get('federated_update_interval_hours', 24)).hours.do(
@@ -157,18 +406,59 @@ class EdgeHealthMonitor:
         
         self.logger.info("Health monitoring started successfully")
         
-        # Main monitoring loop
+        # SIGTERM (e.g. from systemd) ends the main loop like Ctrl+C
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._handle_stop_signal)
+        
+        # Main monitoring loop: sleep until the next scheduled job (capped at a
+        # minute) rather than waking every second just to poll the scheduler
         try:
             while self.running:
+                idle_seconds = schedule.idle_seconds()
+                timeout = 60.0 if idle_seconds is None else min(max(idle_seconds, 0.0), 60.0)
+                if self._stop_event.wait(timeout):
+                    break
                 schedule.run_pending()
-                time.sleep(1)
         except KeyboardInterrupt:
             self.logger.info("Received interrupt signal, shutting down...")
+        
+        if self.running:
             self.stop_monitoring()
     
+    def _handle_stop_signal(self, signum, frame):
+        """Wake the main loop so it can shut down"""
+        self.logger.info(f"Received signal {signum}, shutting down...")
+        self._stop_event.set()
+    
+    def _pin_thread(self, thread: threading.Thread, cores):
+        """Restrict a started thread to the given core(s) (Linux only)"""
+        if cores is None or not hasattr(os, 'sched_setaffinity'):
+            return
+        
+        cores = {cores} if isinstance(cores, int) else set(cores)
+        try:
+            os.sched_setaffinity(thread.native_id, cores)
+        except OSError as e:
+            self.logger.warning(f"Failed to pin thread {thread.name} to cores {sorted(cores)}: {e}")
+    
+    def _pin_current_thread(self, cores):
+        """Restrict the calling thread to the given core(s) (Linux only)"""
+        self._pin_thread(threading.current_thread(), cores)
+    
+    def _set_realtime_priority(self, priority: int):
+        """Switch the calling thread to SCHED_FIFO (needs CAP_SYS_NICE)"""
+        if not hasattr(os, 'sched_setscheduler'):
+            return
+        
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        except OSError as e:
+            self.logger.warning(f"Failed to set SCHED_FIFO priority {priority}: {e}")
+    
     def stop_monitoring(self):
         """Stop the health monitoring system"""
         self.running = False
+        self._stop_event.set()
         
         # Wait for threads to complete
         for thread in self.threads:
@@ -179,143 +469,304 @@ class EdgeHealthMonitor:
             if hasattr(sensor, 'close'):
                 sensor.close()
         
+        self._http.close()
+        
         self.logger.info("Health monitoring stopped")
     
-    def _sensor_data_collector(self, sensor_name: str, sensor):
+    def _sensor_poll_loop(self):
+        """Poll all sensors from one event loop instead of a thread per sensor"""
+        asyncio.run(self._poll_sensors())
+    
+    async def _poll_sensors(self):
+        """Run the polling coroutines for every sensor"""
+        interval = self.config.get('sensor_sampling_interval', 1.0)
+        
+        # One reader thread per sensor, pinned to the sensor cores as it starts;
+        # hardware reads block (SpO2 samples for ~2 s), so they run off the loop
+        cores = self._cpu_pinning.get('sensors')
+        executors = {
+            sensor_name: ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=f"sensor-{sensor_name}",
+                initializer=self._pin_current_thread,
+                initargs=(cores,)
+            )
+            for sensor_name in self.sensors
+        }
+        
+        try:
+            await asyncio.gather(*(
+                self._sensor_data_collector(sensor_name, sensor, interval, executors[sensor_name])
+                for sensor_name, sensor in self.sensors.items()
+            ))
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=False)
+    
+    async def _sensor_data_collector(self, sensor_name: str, sensor, interval: float,
+                                     executor: ThreadPoolExecutor):
         """Collect data from a specific sensor"""
+        loop = asyncio.get_running_loop()
         while self.running:
             try:
-                data = sensor.read()
+                data = await loop.run_in_executor(executor, sensor.read)
                 if data is not None:
-                    sensor_data = {
-                        'sensor': sensor_name,
-                        'timestamp': time.time(),
-                        'data': data
-                    }
-                    
-                    if not self.sensor_data_queue.full():
-                        self.sensor_data_queue.put(sensor_data)
-                    else:
-                        self.logger.warning(f"Sensor data queue full, dropping {sensor_name} data")
+                    if not self._push_sample(sensor_name, time.monotonic_ns(), data):
+                        self.logger.warning(f"Sensor ring for {sensor_name} full, dropping sample")
                 
-                time.sleep(self.config.get('sensor_sampling_interval', 1.0))
+                await asyncio.sleep(interval)
                 
             except Exception as e:
                 self.logger.error(f"Error collecting data from {sensor_name}: {e}")
-                time.sleep(5)  # Wait before retrying
+                await asyncio.sleep(5)  # Wait before retrying
+    
+    def _push_sample(self, sensor_name: str, timestamp: int, data: np.ndarray) -> bool:
+        """Write a sample into the sensor's ring; False if the ring is full"""
+        with self._sensor_cv:
+            ring = self._rings.get(sensor_name)
+            if ring is None:
+                ring = {
+                    'ts': np.empty(self._ring_capacity, dtype=np.int64),
+                    'x': np.empty((self._ring_capacity,) + np.shape(data), dtype=np.float32),
+                    'head': 0,
+                    'tail': 0
+                }
+                self._rings[sensor_name] = ring
+            
+            # Slots between tail and head may still be read by the inference
+            # worker, so new samples are dropped rather than overwriting them
+            if ring['head'] - ring['tail'] >= self._ring_capacity:
+                return False
+            
+            slot = ring['head'] % self._ring_capacity
+            ring['x'][slot] = data
+            ring['ts'][slot] = timestamp
+            ring['head'] += 1
+            self._sensor_cv.notify()
+        return True
+    
+    def _pending_samples(self) -> int:
+        """Largest number of unread samples across sensor rings (call with _sensor_cv held)"""
+        return max((ring['head'] - ring['tail'] for ring in self._rings.values()), default=0)
+    
+    def _peek_samples(self, batch_size: int) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+        """Contiguous (timestamps, data) slices of unread samples per sensor
+        
+        The slices are views into the rings and stay valid until released with
+        _release_samples, since producers never overwrite unread slots.
+        """
+        spans = {}
+        for sensor_name, ring in self._rings.items():
+            start = ring['tail'] % self._ring_capacity
+            count = min(ring['head'] - ring['tail'], batch_size, self._ring_capacity - start)
+            if count > 0:
+                spans[sensor_name] = (ring['ts'][start:start + count], ring['x'][start:start + count])
+        return spans
+    
+    def _release_samples(self, spans: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        """Mark samples returned by _peek_samples as consumed"""
+        with self._sensor_cv:
+            for sensor_name, (timestamps, _) in spans.items():
+                self._rings[sensor_name]['tail'] += len(timestamps)
+    
+    @staticmethod
+    def _push_item(ring: deque, cv: threading.Condition, item) -> bool:
+        """Append to a bounded ring and wake a consumer; False if the oldest item was dropped"""
+        with cv:
+            has_room = len(ring) < ring.maxlen
+            ring.append(item)
+            cv.notify()
+        return has_room
+    
+    @staticmethod
+    def _pop_item(ring: deque, cv: threading.Condition, timeout: float):
+        """Pop the oldest item from a ring, waiting up to timeout seconds"""
+        with cv:
+            if not cv.wait_for(lambda: ring, timeout=timeout):
+                return None
+            return ring.popleft()
     
     def _inference_worker(self):
         """Process sensor data through ML models"""
+        batch_size = self.config.get('inference_batch_size', 8)
+        max_wait = self.config.get('inference_max_wait_ms', 50) / 1000.0
+        
+        # Real-time priority keeps sampling-to-prediction latency steady
+        if 'inference_priority' in self._cpu_pinning:
+            self._set_realtime_priority(self._cpu_pinning['inference_priority'])
+        
         while self.running:
             try:
-                # Get sensor data (blocking with timeout)
-                try:
-                    sensor_data = self.sensor_data_queue.get(timeout=1)
-                except queue.Empty:
-                    continue
-                
-                sensor_name = sensor_data['sensor']
-                data = sensor_data['data']
-                
-                # Run inference if model is available
-                if sensor_name in self.models:
-                    prediction = self._run_inference(sensor_name, data)
-                    
-                    result = {
-                        'sensor': sensor_name,
-                        'timestamp': sensor_data['timestamp'],
-                        'raw_data': data,
-                        'prediction': prediction
-                    }
-                    
-                    if not self.inference_results_queue.full():
-                        self.inference_results_queue.put(result)
-                    else:
-                        self.logger.warning("Inference results queue full, dropping result")
+                # Wait for samples, then give each ring up to max_wait to fill a batch
+                with self._sensor_cv:
+                    if not self._sensor_cv.wait_for(self._pending_samples, timeout=1):
+                        continue
+                    self._sensor_cv.wait_for(
+                        lambda: self._pending_samples() >= batch_size, timeout=max_wait
+                    )
+                    spans = self._peek_samples(batch_size)
                 
-                self.sensor_data_queue.task_done()
+                try:
+                    for sensor_name, (timestamps, samples) in spans.items():
+                        # Run inference if model is available
+                        if sensor_name in self.models:
+                            with self._models_lock:
+                                predictions = self._run_inference(sensor_name, samples)
+                            
+                            for i, prediction in enumerate(predictions):
+                                result = {
+                                    'sensor': sensor_name,
+                                    'timestamp': int(timestamps[i]),
+                                    'raw_data': samples[i].copy(),
+                                    'prediction': prediction
+                                }
+                                
+                                if not self._push_item(self.results_ring, self._results_cv, result):
+                                    self.logger.warning("Inference results ring full, dropped oldest result")
+                finally:
+                    self._release_samples(spans)
                 
             except Exception as e:
                 self.logger.error(f"Error in inference worker: {e}")
     
-    def _run_inference(self, sensor_name: str, data: np.ndarray) -> Dict:
-        """Run inference on sensor data using TensorFlow Lite model"""
+    def _run_inference(self, sensor_name: str, samples: np.ndarray) -> List[Dict]:
+        """Run batched inference on sensor samples using TensorFlow Lite model"""
         try:
-            model = self.models[sensor_name]
+            return self._pipelines[sensor_name](samples)
             
-            # Get input details
-            input_details = model.get_input_details()
-            output_details = model.get_output_details()
+        except Exception as e:
+            self.logger.error(f"Inference error for {sensor_name}: {e}")
+            return [{'error': str(e)}] * len(samples)
+    
+    def _build_pipeline(self, sensor_name: str, io: Dict):
+        """Generate the fused preprocess -> invoke -> postprocess function for a model
+        
+        Everything that does not change between samples (tensor views, quantization
+        parameters, fill kernel, sensor-specific post-processing) is resolved here
+        once, so the returned function only does the per-batch work.
+        """
+        interp = io['interp']
+        in_view = io['in_view']
+        out_view = io['out_view']
+        
+        # Fill kernel for the input tensor
+        quant = io['quant']
+        if quant is not None:
+            scale, zero_point, qmin, qmax = quant
             
-            # Preprocess data to match model input shape
-            input_data = self._preprocess_data(data, input_details[0]['shape'])
+            def fill(src, dst):
+                _quantize_into(src, dst, scale, zero_point, qmin, qmax)
+        else:
+            fill = _copy_into
+        
+        # Dequantization parameters for integer outputs
+        out_quant = None
+        if io['out']['dtype'] in (np.uint8, np.int8):
+            out_quant = io['out']['quantization']
+        
+        postprocess = {
+            'heart_rate': self._postprocess_heart_rate,
+            'spo2': self._postprocess_spo2,
+            'activity': self._postprocess_activity
+        }.get(sensor_name, self._postprocess_raw)
+        
+        def pipeline(samples: np.ndarray) -> List[Dict]:
+            batch = len(samples)
             
-            # Set input and run inference
-            model.set_tensor(input_details[0]['index'], input_data)
-            model.invoke()
+            # Fall back to one invoke per sample if the model cannot be batched
+            if not self._resize_batch(io, batch):
+                return [pipeline(samples[i:i + 1])[0] for i in range(batch)]
             
-            # Get output
-            output_data = model.get_tensor(output_details[0]['index'])
+            # Ring slices are already contiguous float32, so this is a no-copy reshape
+            src = np.ascontiguousarray(samples, dtype=np.float32).reshape(-1)
+            input_buf = in_view()
+            expected = input_buf.size // io['batch'] * batch
+            if src.size != expected:
+                raise ValueError(f"Expected {expected} input values, got {src.size}")
             
-            # Post-process results
-            prediction = self._postprocess_prediction(sensor_name, output_data)
+            # Fill the leading rows; padding rows are ignored in the output
+            fill(src, input_buf.reshape(-1)[:src.size])
+            del input_buf
             
-            return prediction
+            # Run inference (no views may be held across invoke)
+            interp.invoke()
             
-        except Exception as e:
-            self.logger.error(f"Inference error for {sensor_name}: {e}")
-            return {'error': str(e)}
-    
-    def _preprocess_data(self, data: np.ndarray, target_shape: Tuple) -> np.ndarray:
-        """Preprocess sensor data to match model input requirements"""
-        # Reshape and normalize data as needed
-        if len(data.shape) != len(target_shape) - 1:  # Account for batch dimension
-            data = data.reshape(target_shape[1:])
-        
-        # Add batch dimension
-        data = np.expand_dims(data, axis=0)
-        
-        # Ensure correct data type
-        data = data.astype(np.float32)
-        
-        return data
-    
-    def _postprocess_prediction(self, sensor_name: str, output_data: np.ndarray) -> Dict:
-        """Post-process model output into meaningful results"""
-        if sensor_name == 'heart_rate':
-            # Binary classification: normal vs. anomalous
-            anomaly_score = float(output_data[0][0])
-            return {
-                'anomaly_score': anomaly_score,
-                'is_anomalous': anomaly_score > 0.5,
-                'confidence': max(anomaly_score, 1 - anomaly_score)
-            }
+            # Read the output tensor in place, dequantizing integer outputs
+            output_data = out_view()
+            if out_quant is not None:
+                output_data = (output_data.astype(np.float32) - out_quant[1]) * out_quant[0]
+            
+            # Post-process results per sample
+            return [postprocess(output_data[i]) for i in range(batch)]
         
-        elif sensor_name == 'spo2':
-            # Regression: predicted SpO2 level
-            predicted_spo2 = float(output_data[0][0])
-            return {
-                'predicted_spo2': predicted_spo2,
-                'is_critical': predicted_spo2 < 90.0
-            }
+        return pipeline
+    
+    def _resize_batch(self, io: Dict, batch: int) -> bool:
+        """Make sure the model input holds at least batch samples
         
-        elif sensor_name == 'activity':
-            # Multi-class classification: activity types
-            activity_probs = output_data[0]
-            activity_labels = ['resting', 'walking', 'running', 'sleeping']
-            predicted_activity = activity_labels[np.argmax(activity_probs)]
-            confidence = float(np.max(activity_probs))
+        Smaller batches are padded to the allocated size, and the allocation only
+        grows in powers of two, so tensors are reallocated a few times at most
+        instead of whenever the batch size changes.
+        """
+        if batch <= io['batch']:
+            return True
+        if not io['batchable'] and batch > 1:
+            return False
+        
+        model = io['interp']
+        index = io['in']['index']
+        feature_shape = io['in_shape'][1:]
+        capacity = 1 << (batch - 1).bit_length()
+        
+        try:
+            model.resize_tensor_input(index, [capacity, *feature_shape])
+            model.allocate_tensors()
+            io['batch'] = capacity
+            return True
             
-            return {
-                'activity': predicted_activity,
-                'confidence': confidence,
-                'probabilities': {
-                    label: float(prob) 
-                    for label, prob in zip(activity_labels, activity_probs)
-                }
-            }
+        except (ValueError, RuntimeError) as e:
+            self.logger.warning(f"Batched inference unsupported for model input {io['in']['name']}: {e}")
+            io['batchable'] = False
+            model.resize_tensor_input(index, [1, *feature_shape])
+            model.allocate_tensors()
+            io['batch'] = 1
+            return False
+    
+    def _postprocess_heart_rate(self, output_row: np.ndarray) -> Dict:
+        """Binary classification: normal vs. anomalous"""
+        anomaly_score = float(output_row[0])
+        return {
+            'anomaly_score': anomaly_score,
+            'is_anomalous': anomaly_score > ANOMALY_THRESHOLD,
+            'confidence': max(anomaly_score, 1.0 - anomaly_score)
+        }
+    
+    def _postprocess_spo2(self, output_row: np.ndarray) -> Dict:
+        """Regression: predicted SpO2 level"""
+        predicted_spo2 = float(output_row[0])
+        return {
+            'predicted_spo2': predicted_spo2,
+            'is_critical': predicted_spo2 < CRITICAL_SPO2
+        }
+    
+    def _postprocess_activity(self, output_row: np.ndarray) -> Dict:
+        """Multi-class classification: activity types"""
+        idx = int(output_row.argmax())
+        
+        prediction = {
+            'activity': ACTIVITY_LABELS[idx],
+            'confidence': float(output_row[idx])
+        }
         
-        return {'raw_output': output_data.tolist()}
+        # Full class distribution is only reported when debugging
+        if self._debug:
+            prediction['probabilities'] = dict(zip(ACTIVITY_LABELS, output_row.tolist()))
+        
+        return prediction
+    
+    def _postprocess_raw(self, output_row: np.ndarray) -> Dict:
+        """Unknown model: pass the raw output through"""
+        return {'raw_output': output_row[np.newaxis].tolist()}
     
     def _data_transmission_worker(self):
         """Transmit inference results to the federation server"""
@@ -323,20 +774,17 @@ class EdgeHealthMonitor:
         batch_interval = self.config.get('transmission_interval_seconds', 30)
         
         batch = []
-        last_transmission = time.time()
+        last_transmission = time.monotonic()
         
         while self.running:
             try:
                 # Collect batch of results
-                try:
-                    result = self.inference_results_queue.get(timeout=1)
+                result = self._pop_item(self.results_ring, self._results_cv, 1)
+                if result is not None:
                     batch.append(result)
-                    self.inference_results_queue.task_done()
-                except queue.Empty:
-                    pass
                 
                 # Transmit batch if it's full or enough time has passed
-                current_time = time.time()
+                current_time = time.monotonic()
                 should_transmit = (
                     len(batch) >= batch_size or
                     (batch and current_time - last_transmission >= batch_interval)
@@ -353,24 +801,31 @@ class EdgeHealthMonitor:
     def _transmit_batch(self, batch: List[Dict]):
         """Transmit a batch of results to the federation server"""
         try:
+            # Convert monotonic sample timestamps to wall-clock seconds
+            for result in batch:
+                result['timestamp'] = (result['timestamp'] + self._wall_clock_offset_ns) / 1e9
+            
             # Encrypt the batch data
-            encrypted_data = self.encryption_manager.encrypt_data(batch)
+            encrypted_data = self._encrypt_batch(batch)
             
             # Prepare payload
             payload = {
                 'device_id': self.config.get('device_id'),
                 'encrypted_data': encrypted_data,
+                'compression': 'zstd',
                 'batch_size': len(batch),
                 'timestamp': time.time()
             }
             
+            # Serialize once and send over the pooled session
+            payload_bytes = orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+            
             # Send to federation server
             federation_url = self.config.get('federation_server_url')
-            response = requests.post(
+            response = self._http.post(
                 f"{federation_url}/api/v1/health-data",
-                json=payload,
-                headers={'Content-Type': 'application/json'},
-                timeout=30
+                data=payload_bytes,
+                timeout=(5, 30)
             )
             
             if response.status_code == 200:
@@ -396,7 +851,12 @@ class EdgeHealthMonitor:
                 # Download and apply global model updates
                 new_models = self.federated_updater.download_global_models()
                 if new_models:
-                    self.models.update(new_models)
+                    # Swap only between invokes; the old interpreters (and their
+                    # file mappings) are released once nothing references them
+                    with self._models_lock:
+                        self.models.update(new_models)
+                        for sensor_name, model in new_models.items():
+                            self._prepare_model(sensor_name, model)
                     self.logger.info("Successfully updated models with federated learning")
             
         except Exception as e:
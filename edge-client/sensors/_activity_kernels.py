@@ -0,0 +1,39 @@
+"""
+Activity Feature Kernels
+Step detection over sliding windows of IMU magnitudes
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit('int64(float64[::1], float64)', cache=True, nogil=True, fastmath=True)
+    def count_crossings(values, threshold):
+        """Count rising crossings of values over threshold"""
+        steps = 0
+        above_threshold = False
+        
+        for i in range(values.size):
+            if values[i] > threshold and not above_threshold:
+                steps += 1
+                above_threshold = True
+            elif values[i] <= threshold:
+                above_threshold = False
+        
+        return steps
+else:
+    def count_crossings(values, threshold):
+        """Count rising crossings of values over threshold"""
+        above = values > threshold
+        return int(above[0]) + int(np.count_nonzero(above[1:] & ~above[:-1]))
+
+
+def prewarm():
+    """Run the kernels once so dispatch is warm before the first window"""
+    count_crossings(np.zeros(2), 0.0)
@@ -0,0 +1,130 @@
+"""
+Heart Rate Kernels
+Moving-average filtering, peak detection and BPM estimation for IR signals
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit('float64[::1](float32[::1], int64)', cache=True, nogil=True, fastmath=True)
+    def bandpass_filter(signal, window_size):
+        """Moving average (zero-padded like np.convolve mode='same') with DC removed"""
+        n = signal.size
+        out = np.empty(n)
+        if n < window_size:
+            for i in range(n):
+                out[i] = signal[i]
+            return out
+        
+        # Running window sum over signal[i - half:i + window_size - half]
+        half = window_size // 2
+        acc = 0.0
+        for j in range(window_size - half):
+            acc += signal[j]
+        
+        total = 0.0
+        for i in range(n):
+            out[i] = acc / window_size
+            total += out[i]
+            if i + window_size - half < n:
+                acc += signal[i + window_size - half]
+            if i - half >= 0:
+                acc -= signal[i - half]
+        
+        # Remove DC component
+        mean = total / n
+        for i in range(n):
+            out[i] -= mean
+        
+        return out
+    
+    @njit('int64[::1](float64[::1], float64)', cache=True, nogil=True, fastmath=True)
+    def find_peaks(signal, peak_threshold):
+        """Indices of local maxima above std(signal) * peak_threshold"""
+        n = signal.size
+        peaks = np.empty(max(n - 2, 0), dtype=np.int64)
+        if n < 3:
+            return peaks
+        
+        threshold = np.std(signal) * peak_threshold
+        count = 0
+        for i in range(1, n - 1):
+            if signal[i] > signal[i - 1] and signal[i] > signal[i + 1] and signal[i] > threshold:
+                peaks[count] = i
+                count += 1
+        
+        return peaks[:count]
+    
+    @njit('float64(float32[::1], float64, float64, int64, float64)', cache=True, nogil=True, fastmath=True)
+    def calc_hr(raw_signal, sample_dt, peak_threshold, window_size, prev_hr):
+        """Heart rate in BPM from a raw IR signal, or prev_hr if no valid rate is found"""
+        filtered = bandpass_filter(raw_signal, window_size)
+        peaks = find_peaks(filtered, peak_threshold)
+        
+        if peaks.size >= 2:
+            # Mean interval between peaks: the diffs telescope to first/last
+            avg_interval = (peaks[-1] - peaks[0]) * sample_dt / (peaks.size - 1)
+            heart_rate = 60.0 / avg_interval
+            
+            # Validate heart rate range
+            if 40.0 <= heart_rate <= 200.0:
+                return heart_rate
+        
+        return prev_hr
+else:
+    def bandpass_filter(signal, window_size):
+        """Moving average (zero-padded like np.convolve mode='same') with DC removed"""
+        n = len(signal)
+        if n < window_size:
+            return signal.astype(np.float64)
+        
+        # O(n) moving average from cumulative sums
+        half = window_size // 2
+        csum = np.zeros(n + window_size)
+        np.cumsum(signal, out=csum[half + 1:half + 1 + n])
+        csum[half + 1 + n:] = csum[half + n]
+        filtered = csum[window_size:] - csum[:n]
+        filtered *= 1.0 / window_size
+        
+        # Remove DC component
+        filtered -= filtered.mean()
+        
+        return filtered
+    
+    def find_peaks(signal, peak_threshold):
+        """Indices of local maxima above std(signal) * peak_threshold"""
+        if len(signal) < 3:
+            return np.empty(0, dtype=np.int64)
+        
+        threshold = signal.std() * peak_threshold
+        center = signal[1:-1]
+        is_peak = (center > signal[:-2]) & (center > signal[2:]) & (center > threshold)
+        
+        return np.flatnonzero(is_peak) + 1
+    
+    def calc_hr(raw_signal, sample_dt, peak_threshold, window_size, prev_hr):
+        """Heart rate in BPM from a raw IR signal, or prev_hr if no valid rate is found"""
+        peaks = find_peaks(bandpass_filter(raw_signal, window_size), peak_threshold)
+        
+        if len(peaks) >= 2:
+            # Mean interval between peaks: the diffs telescope to first/last
+            avg_interval = (peaks[-1] - peaks[0]) * sample_dt / (len(peaks) - 1)
+            heart_rate = 60.0 / avg_interval
+            
+            # Validate heart rate range
+            if 40.0 <= heart_rate <= 200.0:
+                return heart_rate
+        
+        return prev_hr
+
+
+def prewarm():
+    """Run the kernels once so dispatch is warm before the first reading"""
+    calc_hr(np.zeros(8, dtype=np.float32), 0.04, 0.6, 5, 70.0)
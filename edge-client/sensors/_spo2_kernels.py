@@ -0,0 +1,78 @@
+"""
+SpO2 Kernels
+Ratio-of-ratios SpO2 estimation from red and IR sample windows
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit('float64(float32[::1], float32[::1], float64, float64, float64)',
+          cache=True, nogil=True, fastmath=True)
+    def spo2_from_signals(red, ir, a, b, c):
+        """SpO2 = a*R^2 + b*R + c from red/IR windows; NaN if invalid or out of range"""
+        n = red.size
+        red_sum = 0.0
+        red_sq = 0.0
+        ir_sum = 0.0
+        ir_sq = 0.0
+        
+        # Sums and sums of squares for both channels in one loop
+        for i in range(n):
+            r = np.float64(red[i])
+            x = np.float64(ir[i])
+            red_sum += r
+            red_sq += r * r
+            ir_sum += x
+            ir_sq += x * x
+        
+        # DC is the mean, AC the standard deviation
+        red_dc = red_sum / n
+        ir_dc = ir_sum / n
+        red_ac = np.sqrt(max(red_sq / n - red_dc * red_dc, 0.0))
+        ir_ac = np.sqrt(max(ir_sq / n - ir_dc * ir_dc, 0.0))
+        
+        if red_dc == 0 or ir_dc == 0 or ir_ac == 0:
+            return np.nan
+        
+        # Ratio of ratios and calibration polynomial (Horner form)
+        R = (red_ac / red_dc) / (ir_ac / ir_dc)
+        spo2 = (a * R + b) * R + c
+        
+        if 70.0 <= spo2 <= 100.0:
+            return spo2
+        return np.nan
+else:
+    def spo2_from_signals(red, ir, a, b, c):
+        """SpO2 = a*R^2 + b*R + c from red/IR windows; NaN if invalid or out of range"""
+        red = red.astype(np.float64)
+        ir = ir.astype(np.float64)
+        
+        # DC is the mean, AC the standard deviation
+        red_dc = red.mean()
+        ir_dc = ir.mean()
+        red_ac = red.std()
+        ir_ac = ir.std()
+        
+        if red_dc == 0 or ir_dc == 0 or ir_ac == 0:
+            return np.nan
+        
+        # Ratio of ratios and calibration polynomial (Horner form)
+        R = (red_ac / red_dc) / (ir_ac / ir_dc)
+        spo2 = (a * R + b) * R + c
+        
+        if 70.0 <= spo2 <= 100.0:
+            return float(spo2)
+        return np.nan
+
+
+def prewarm():
+    """Run the kernel once so dispatch is warm before the first reading"""
+    window = np.ones(2, dtype=np.float32)
+    spo2_from_signals(window, window, 0.0, 0.0, 0.0)
@@ -3,11 +3,16 @@ Activity Recognition Sensor Module
 Interfaces with LSM6DS33 IMU for activity and motion detection
 """
 
+import functools
+import math
 import time
 import numpy as np
 from typing import Optional, Dict, List
 import logging
 from collections import deque
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ._activity_kernels import count_crossings, prewarm
 
 try:
     import board
@@ -18,6 +23,96 @@ except ImportError:
     GPIO_AVAILABLE = False
     logging.warning("GPIO libraries not available, using simulation mode")
 
+logger = logging.getLogger(__name__)
+
+# Simulated motion per activity: (accel noise sigma, gyro noise sigma, accel base,
+# step frequency in Hz, accel x/y wave amplitudes, gyro x/y/z wave amplitudes)
+SIMULATION_PROFILES = {
+    'resting': (0.1, 0.05, np.array([0.1, 0.1, 9.8], dtype=np.float32), 0.0, 0.0, 0.0, 0.0, 0.0, 0.0),
+    'walking': (0.2, 0.1, np.array([0.0, 0.0, 9.8], dtype=np.float32), 2.0, 0.5, 0.2, 0.1, 0.1, 0.05),
+    'running': (0.5, 0.2, np.array([0.0, 0.0, 9.8], dtype=np.float32), 3.5, 1.5, 0.8, 0.3, 0.4, 0.2),
+    'sleeping': (0.03, 0.01, np.array([0.05, 0.05, 9.8], dtype=np.float32), 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+}
+
+
+class SlidingStats:
+    """O(1) mean, std (ddof=0), max, min and energy over the last N values
+    
+    Mean and variance use Welford's update for the incoming value and the
+    reverse update for the evicted one; max/min use monotonic deques.
+    """
+    
+    def __init__(self, size: int):
+        self.size = size
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.energy = 0.0
+        
+        # Mirrored ring (each value stored at idx and idx + size) so the
+        # current window is always one contiguous slice
+        self._values = np.zeros(2 * size)
+        self._idx = 0
+        self._seq = 0
+        self._max = deque()  # (seq, value), values decreasing
+        self._min = deque()  # (seq, value), values increasing
+    
+    def push(self, value: float):
+        """Add a value, evicting the oldest once the window is full"""
+        if self.count == self.size:
+            old = self._values[self._idx]
+            self.count -= 1
+            if self.count:
+                delta = old - self.mean
+                self.mean -= delta / self.count
+                self.m2 -= delta * (old - self.mean)
+            else:
+                self.mean = self.m2 = 0.0
+            self.energy -= old * old
+        
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.energy += value * value
+        
+        self._values[self._idx] = value
+        self._values[self._idx + self.size] = value
+        self._idx = (self._idx + 1) % self.size
+        
+        seq = self._seq
+        self._seq += 1
+        while self._max and self._max[-1][1] <= value:
+            self._max.pop()
+        self._max.append((seq, value))
+        if self._max[0][0] <= seq - self.size:
+            self._max.popleft()
+        while self._min and self._min[-1][1] >= value:
+            self._min.pop()
+        self._min.append((seq, value))
+        if self._min[0][0] <= seq - self.size:
+            self._min.popleft()
+    
+    @property
+    def std(self) -> float:
+        """Standard deviation (ddof=0) of the window"""
+        return math.sqrt(max(self.m2, 0.0) / self.count) if self.count else 0.0
+    
+    @property
+    def max(self) -> float:
+        """Largest value in the window"""
+        return self._max[0][1]
+    
+    @property
+    def min(self) -> float:
+        """Smallest value in the window"""
+        return self._min[0][1]
+    
+    def window(self) -> np.ndarray:
+        """Values currently in the window, oldest first (a view)"""
+        end = self._idx + self.size
+        return self._values[end - self.count:end]
+
 
 class ActivitySensor:
     """Activity sensor using LSM6DS33 IMU (accelerometer + gyroscope)"""
@@ -29,7 +124,7 @@ class ActivitySensor:
             i2c_address: I2C address of the LSM6DS33 sensor
             simulation_mode: Force simulation mode for testing
         """
-        self.logger = logging.getLogger(__name__)
+        self._hw_ready = False
         self.i2c_address = i2c_address
         
         # Use simulation mode if GPIO not available or explicitly requested
@@ -49,11 +144,12 @@ class ActivitySensor:
                 self.sensor.accelerometer_data_rate = lsm6ds33.Rate.RATE_104_HZ
                 self.sensor.gyro_data_rate = lsm6ds33.Rate.RATE_104_HZ
                 
-                self.logger.info(f"LSM6DS33 activity sensor initialized at address 0x{i2c_address:02x}")
+                self._hw_ready = True
+                logger.info(f"LSM6DS33 activity sensor initialized at address 0x{i2c_address:02x}")
                 
             except Exception as e:
-                self.logger.warning(f"Failed to initialize hardware sensor: {e}")
-                self.logger.info("Falling back to simulation mode")
+                logger.warning(f"Failed to initialize hardware sensor: {e}")
+                logger.info("Falling back to simulation mode")
                 self.simulation_mode = True
         
         # Initialize simulation variables
@@ -61,17 +157,49 @@ class ActivitySensor:
             self.current_activity = 'resting'
             self.activity_cycle_time = 0
             self.time_offset = time.time()
-            self.logger.info("Activity sensor running in simulation mode")
+            
+            # Reusable generator and scratch buffers for simulated samples
+            self._rng = np.random.default_rng()
+            self._scratch = np.empty(6, dtype=np.float32)
+            
+            # Per-activity stepping phase, advanced by omega * dt each sample so
+            # it stays in [0, 2*pi) instead of growing with the runtime
+            self._phase = dict.fromkeys(SIMULATION_PROFILES, 0.0)
+            self._last_time_val = 0.0
+            
+            # Straight-line generator per activity with its profile pre-bound
+            self._generators = {}
+            for name, (accel_sigma, gyro_sigma, accel_base, freq, *amplitudes) in SIMULATION_PROFILES.items():
+                if freq:
+                    self._generators[name] = functools.partial(
+                        self._gen_stepping, name, accel_sigma, gyro_sigma, accel_base,
+                        2 * math.pi * freq, *amplitudes
+                    )
+                else:
+                    self._generators[name] = functools.partial(
+                        self._gen_static, accel_sigma, gyro_sigma, accel_base
+                    )
+            logger.info("Activity sensor running in simulation mode")
         
-        # Data buffers for activity recognition
-        self.accel_buffer = deque(maxlen=100)  # 1 second at 100Hz
-        self.gyro_buffer = deque(maxlen=100)
+        # Output sample: accelerometer in [0:3], gyroscope in [3:6]
+        self._out = np.empty(6, dtype=np.float32)
+        
+        # Samples buffered for activity recognition (1 second at 100Hz)
+        self.buffer_capacity = 100
+        self._buffered = 0
         
         # Feature calculation variables
         self.window_size = 50  # 0.5 seconds
         self.step_count = 0
         self.last_step_time = 0
         
+        # Magnitude statistics over the feature window, updated per sample
+        self._accel_stats = SlidingStats(self.window_size)
+        self._gyro_stats = SlidingStats(self.window_size)
+        
+        # Compile/load the feature kernels before the first window
+        prewarm()
+        
         # Activity detection thresholds
         self.thresholds = {
             'resting': {'accel_std': 0.1, 'gyro_std': 0.05},
@@ -79,12 +207,33 @@ class ActivitySensor:
             'running': {'accel_std': 1.0, 'gyro_std': 0.5},
             'sleeping': {'accel_std': 0.05, 'gyro_std': 0.02}
         }
+        
+        # Classification lookup derived from the thresholds (sleeping < resting).
+        # Rows are accel_std bins, columns gyro_std bins; a cell holds an index
+        # into _table_activities, or -1 when step frequency decides.
+        self._accel_std_bins = np.array([
+            self.thresholds['sleeping']['accel_std'],
+            self.thresholds['resting']['accel_std'],
+            np.nextafter(self.thresholds['running']['accel_std'], np.inf)  # strictly above
+        ])
+        self._gyro_std_bins = np.array([
+            self.thresholds['sleeping']['gyro_std'],
+            self.thresholds['resting']['gyro_std']
+        ])
+        self._activity_table = np.array([
+            [0, 1, -1],
+            [1, 1, -1],
+            [-1, -1, -1],
+            [2, 2, 2]
+        ])
+        self._table_activities = (('sleeping', 0.9), ('resting', 0.8), ('running', 0.85))
     
     def read(self) -> Optional[np.ndarray]:
         """Read activity sensor data
         
         Returns:
-            numpy array with accelerometer and gyroscope data, or None if no data available
+            numpy array with accelerometer and gyroscope data, or None if no data available.
+            The array is reused by the next read, so callers must copy it to keep it.
         """
         try:
             if self.simulation_mode:
@@ -93,32 +242,26 @@ class ActivitySensor:
                 return self._read_hardware()
                 
         except Exception as e:
-            self.logger.error(f"Error reading activity sensor: {e}")
+            logger.error(f"Error reading activity sensor: {e}")
             return None
     
     def _read_hardware(self) -> Optional[np.ndarray]:
         """Read data from actual LSM6DS33 sensor"""
         try:
+            out = self._out
+            
             # Read accelerometer data (x, y, z in m/s²)
-            accel_x, accel_y, accel_z = self.sensor.acceleration
+            out[0], out[1], out[2] = self.sensor.acceleration
             
             # Read gyroscope data (x, y, z in rad/s)
-            gyro_x, gyro_y, gyro_z = self.sensor.gyro
+            out[3], out[4], out[5] = self.sensor.gyro
             
-            # Store in buffers
-            accel_data = np.array([accel_x, accel_y, accel_z])
-            gyro_data = np.array([gyro_x, gyro_y, gyro_z])
+            self._store_sample(out)
             
-            self.accel_buffer.append(accel_data)
-            self.gyro_buffer.append(gyro_data)
-            
-            # Combine accelerometer and gyroscope data
-            combined_data = np.concatenate([accel_data, gyro_data])
-            
-            return combined_data.astype(np.float32)
+            return out
             
         except Exception as e:
-            self.logger.error(f"Hardware sensor read error: {e}")
+            logger.error(f"Hardware sensor read error: {e}")
             return None
     
     def _read_simulated(self) -> np.ndarray:
@@ -139,72 +282,113 @@ class ActivitySensor:
             self.current_activity = 'sleeping'
         
         # Generate realistic sensor data based on current activity
-        accel_data, gyro_data = self._generate_activity_data(self.current_activity, current_time)
+        out = self._out
+        self._generate_activity_data(self.current_activity, current_time, out[:3], out[3:])
+        
+        self._store_sample(out)
+        
+        return out
+    
+    def read_batch(self, n_samples: int, activity: Optional[str] = None,
+                   sample_interval: float = 0.01) -> Optional[np.ndarray]:
+        """Generate a batch of simulated samples in one vectorized pass
+        
+        Intended for offline consumers (training, replay, evaluation); the
+        samples are not added to the live feature buffers.
+        
+        Args:
+            n_samples: Number of samples to generate
+            activity: Activity to simulate, defaults to the current simulated activity
+            sample_interval: Seconds between samples (100Hz by default)
+            
+        Returns:
+            (n_samples, 6) float32 array of accelerometer and gyroscope data,
+            or None if not in simulation mode
+        """
+        if not self.simulation_mode:
+            logger.error("Batch reads are only available in simulation mode")
+            return None
+        
+        (accel_sigma, gyro_sigma, accel_base, freq,
+         accel_x_amp, accel_y_amp, gyro_x_amp, gyro_y_amp, gyro_z_amp) = SIMULATION_PROFILES.get(
+            activity or self.current_activity, SIMULATION_PROFILES['sleeping']
+        )
         
-        # Store in buffers
-        self.accel_buffer.append(accel_data)
-        self.gyro_buffer.append(gyro_data)
+        # Stepping pattern for the whole batch
+        t = (time.time() - self.time_offset) + np.arange(n_samples) * sample_interval
+        phase = 2 * np.pi * freq * t
+        wave = np.sin(phase)
         
-        # Combine accelerometer and gyroscope data
-        combined_data = np.concatenate([accel_data, gyro_data])
+        # Noise for all samples and axes in one draw, scaled in place
+        out = self._rng.standard_normal((n_samples, 6), dtype=np.float32)
+        out[:, :3] *= accel_sigma
+        out[:, 3:] *= gyro_sigma
         
-        return combined_data.astype(np.float32)
+        out[:, :3] += accel_base
+        out[:, 0] += accel_x_amp * wave
+        out[:, 1] += accel_y_amp * np.sin(phase + np.pi / 4)
+        
+        out[:, 3] += gyro_x_amp * wave
+        out[:, 4] += gyro_y_amp * np.cos(phase)
+        out[:, 5] += gyro_z_amp * wave
+        
+        return out
     
-    def _generate_activity_data(self, activity: str, time_val: float) -> tuple:
+    def _store_sample(self, sample: np.ndarray):
+        """Push a 6-axis sample's magnitudes into the sliding window statistics"""
+        self._buffered = min(self._buffered + 1, self.buffer_capacity)
+        
+        ax, ay, az, gx, gy, gz = sample.tolist()
+        self._accel_stats.push(math.sqrt(ax * ax + ay * ay + az * az))
+        self._gyro_stats.push(math.sqrt(gx * gx + gy * gy + gz * gz))
+    
+    def _generate_activity_data(self, activity: str, time_val: float,
+                                accel_data: np.ndarray, gyro_data: np.ndarray):
         """Generate realistic sensor data for specific activity
         
         Args:
             activity: Current activity type
             time_val: Current time value for wave generation
-            
-        Returns:
-            Tuple of (accelerometer_data, gyroscope_data)
+            accel_data: Output array for the accelerometer sample (3 values)
+            gyro_data: Output array for the gyroscope sample (3 values)
         """
-        if activity == 'resting':
-            # Small random movements, mostly gravity
-            accel_base = np.array([0.1, 0.1, 9.8])  # Mostly gravity on Z-axis
-            accel_noise = np.random.normal(0, 0.1, 3)
-            accel_data = accel_base + accel_noise
-            
-            gyro_noise = np.random.normal(0, 0.05, 3)
-            gyro_data = gyro_noise
-            
-        elif activity == 'walking':
-            # Regular stepping pattern
-            step_freq = 2.0  # 2 Hz (2 steps per second)
-            step_wave = np.sin(2 * np.pi * step_freq * time_val)
-            
-            accel_base = np.array([0.5 * step_wave, 0.2 * np.sin(2 * np.pi * step_freq * time_val + np.pi/4), 9.8])
-            accel_noise = np.random.normal(0, 0.2, 3)
-            accel_data = accel_base + accel_noise
-            
-            gyro_base = np.array([0.1 * step_wave, 0.1 * np.cos(2 * np.pi * step_freq * time_val), 0.05 * step_wave])
-            gyro_noise = np.random.normal(0, 0.1, 3)
-            gyro_data = gyro_base + gyro_noise
-            
-        elif activity == 'running':
-            # More intense movement patterns
-            run_freq = 3.5  # 3.5 Hz (3.5 steps per second)
-            run_wave = np.sin(2 * np.pi * run_freq * time_val)
-            
-            accel_base = np.array([1.5 * run_wave, 0.8 * np.sin(2 * np.pi * run_freq * time_val + np.pi/4), 9.8])
-            accel_noise = np.random.normal(0, 0.5, 3)
-            accel_data = accel_base + accel_noise
-            
-            gyro_base = np.array([0.3 * run_wave, 0.4 * np.cos(2 * np.pi * run_freq * time_val), 0.2 * run_wave])
-            gyro_noise = np.random.normal(0, 0.2, 3)
-            gyro_data = gyro_base + gyro_noise
-            
-        else:  # sleeping
-            # Very minimal movement
-            accel_base = np.array([0.05, 0.05, 9.8])  # Almost pure gravity
-            accel_noise = np.random.normal(0, 0.03, 3)
-            accel_data = accel_base + accel_noise
-            
-            gyro_noise = np.random.normal(0, 0.01, 3)
-            gyro_data = gyro_noise
+        dt = time_val - self._last_time_val
+        self._last_time_val = time_val
+        
+        generate = self._generators.get(activity) or self._generators['sleeping']
+        generate(dt, accel_data, gyro_data)
+    
+    def _gen_static(self, accel_sigma: float, gyro_sigma: float, accel_base: np.ndarray,
+                    dt: float, accel_data: np.ndarray, gyro_data: np.ndarray):
+        """Resting/sleeping: gravity plus sensor noise"""
+        # Draw noise for all six axes at once
+        self._rng.standard_normal(dtype=np.float32, out=self._scratch)
+        
+        np.multiply(self._scratch[:3], accel_sigma, out=accel_data)
+        accel_data += accel_base
+        np.multiply(self._scratch[3:], gyro_sigma, out=gyro_data)
+    
+    def _gen_stepping(self, activity: str, accel_sigma: float, gyro_sigma: float,
+                      accel_base: np.ndarray, omega: float, accel_x_amp: float, accel_y_amp: float,
+                      gyro_x_amp: float, gyro_y_amp: float, gyro_z_amp: float,
+                      dt: float, accel_data: np.ndarray, gyro_data: np.ndarray):
+        """Walking/running: periodic stepping motion plus sensor noise"""
+        phase = (self._phase[activity] + omega * dt) % (2 * math.pi)
+        self._phase[activity] = phase
+        wave = math.sin(phase)
         
-        return accel_data, gyro_data
+        # Draw noise for all six axes at once
+        self._rng.standard_normal(dtype=np.float32, out=self._scratch)
+        
+        np.multiply(self._scratch[:3], accel_sigma, out=accel_data)
+        accel_data += accel_base
+        accel_data[0] += accel_x_amp * wave
+        accel_data[1] += accel_y_amp * math.sin(phase + math.pi / 4)
+        
+        np.multiply(self._scratch[3:], gyro_sigma, out=gyro_data)
+        gyro_data[0] += gyro_x_amp * wave
+        gyro_data[1] += gyro_y_amp * math.cos(phase)
+        gyro_data[2] += gyro_z_amp * wave
     
     def get_activity_features(self) -> Optional[Dict]:
         """Calculate activity recognition features from sensor data
@@ -212,69 +396,96 @@ class ActivitySensor:
         Returns:
             Dictionary with calculated features or None if insufficient data
         """
-        if len(self.accel_buffer) < self.window_size or len(self.gyro_buffer) < self.window_size:
+        if self._accel_stats.count < self.window_size:
             return None
         
         try:
-            # Get recent data
-            recent_accel = np.array(list(self.accel_buffer)[-self.window_size:])
-            recent_gyro = np.array(list(self.gyro_buffer)[-self.window_size:])
+            accel = self._accel_stats
+            gyro = self._gyro_stats
             
-            # Calculate statistical features
-            features = {}
+            # Statistical features are maintained incrementally per sample
+            features = {
+                'accel_mean': accel.mean,
+                'accel_std': accel.std,
+                'accel_max': accel.max,
+                'accel_min': accel.min,
+                'gyro_mean': gyro.mean,
+                'gyro_std': gyro.std,
+                'gyro_max': gyro.max,
+                'gyro_min': gyro.min,
+                # Frequency domain features (simplified)
+                'accel_energy': accel.energy,
+                'gyro_energy': gyro.energy
+            }
             
-            # Accelerometer features
-            accel_magnitude = np.linalg.norm(recent_accel, axis=1)
-            features['accel_mean'] = np.mean(accel_magnitude)
-            features['accel_std'] = np.std(accel_magnitude)
-            features['accel_max'] = np.max(accel_magnitude)
-            features['accel_min'] = np.min(accel_magnitude)
+            # Step detection
+            steps_detected = self._detect_steps(accel.window(), accel.mean + 0.5 * accel.std)
+            features['step_frequency'] = steps_detected * 2  # Extrapolate to per second
             
-            # Gyroscope features
-            gyro_magnitude = np.linalg.norm(recent_gyro, axis=1)
-            features['gyro_mean'] = np.mean(gyro_magnitude)
-            features['gyro_std'] = np.std(gyro_magnitude)
-            features['gyro_max'] = np.max(gyro_magnitude)
-            features['gyro_min'] = np.min(gyro_magnitude)
+            return features
             
-            # Frequency domain features (simplified)
-            features['accel_energy'] = np.sum(accel_magnitude ** 2)
-            features['gyro_energy'] = np.sum(gyro_magnitude ** 2)
+        except Exception as e:
+            logger.error(f"Feature calculation error: {e}")
+            return None
+    
+    def batch_features(self, samples: np.ndarray, step: int = 1) -> Optional[Dict]:
+        """Calculate activity features for every window of a sample slab
+        
+        Windows are zero-copy sliding views over the magnitudes, so a whole
+        read_batch() slab is processed with a few vectorized reductions.
+        
+        Args:
+            samples: (n, 6) array of accelerometer and gyroscope data
+            step: Stride between consecutive windows
             
-            # Step detection
-            steps_detected = self._detect_steps(accel_magnitude)
-            features['step_frequency'] = steps_detected * 2  # Extrapolate to per second
+        Returns:
+            Dictionary of per-window feature arrays or None if insufficient data
+        """
+        if len(samples) < self.window_size:
+            return None
+        
+        try:
+            features = {}
+            
+            for prefix, axes in (('accel', samples[:, :3]), ('gyro', samples[:, 3:])):
+                squared = np.square(axes, dtype=np.float64).sum(axis=1)
+                windows = sliding_window_view(np.sqrt(squared), self.window_size)[::step]
+                
+                features[f'{prefix}_mean'] = windows.mean(axis=1)
+                features[f'{prefix}_std'] = windows.std(axis=1)
+                features[f'{prefix}_max'] = windows.max(axis=1)
+                features[f'{prefix}_min'] = windows.min(axis=1)
+                features[f'{prefix}_energy'] = sliding_window_view(squared, self.window_size)[::step].sum(axis=1)
+                
+                if prefix == 'accel':
+                    # Step detection: rising edges over mean + 0.5 * std per window
+                    threshold = features['accel_mean'] + 0.5 * features['accel_std']
+                    above = windows > threshold[:, np.newaxis]
+                    steps = above[:, 0] + np.count_nonzero(above[:, 1:] & ~above[:, :-1], axis=1)
+                    features['step_frequency'] = steps * 2  # Extrapolate to per second
             
             return features
             
         except Exception as e:
-            self.logger.error(f"Feature calculation error: {e}")
+            logger.error(f"Batch feature calculation error: {e}")
             return None
     
-    def _detect_steps(self, accel_magnitude: np.ndarray) -> int:
+    def _detect_steps(self, accel_magnitude: np.ndarray, threshold: Optional[float] = None) -> int:
         """Simple step detection based on acceleration peaks
         
         Args:
             accel_magnitude: Acceleration magnitude array
+            threshold: Peak threshold, defaults to mean + 0.5 * std of the magnitudes
             
         Returns:
             Number of steps detected
         """
         try:
             # Simple peak detection for steps
-            threshold = np.mean(accel_magnitude) + 0.5 * np.std(accel_magnitude)
+            if threshold is None:
+                threshold = np.mean(accel_magnitude) + 0.5 * np.std(accel_magnitude)
             
-            steps = 0
-            above_threshold = False
-            
-            for magnitude in accel_magnitude:
-                if magnitude > threshold and not above_threshold:
-                    steps += 1
-                    above_threshold = True
-                elif magnitude <= threshold:
-                    above_threshold = False
-            
-            return steps
+            return count_crossings(np.ascontiguousarray(accel_magnitude, dtype=np.float64), threshold)
             
         except Exception:
             return 0
@@ -296,13 +507,13 @@ class ActivitySensor:
             step_freq = features['step_frequency']
             
             # Classification logic
-            if accel_std < self.thresholds['sleeping']['accel_std'] and gyro_std < self.thresholds['sleeping']['gyro_std']:
-                activity = 'sleeping'
-                confidence = 0.9
-            elif accel_std < self.thresholds['resting']['accel_std'] and gyro_std < self.thresholds['resting']['gyro_std']:
-                activity = 'resting'
-                confidence = 0.8
-            elif accel_std > self.thresholds['running']['accel_std'] or step_freq > 3:
+            row = int(np.searchsorted(self._accel_std_bins, accel_std, side='right'))
+            col = int(np.searchsorted(self._gyro_std_bins, gyro_std, side='right'))
+            entry = self._activity_table[row, col]
+            
+            if entry >= 0:
+                activity, confidence = self._table_activities[entry]
+            elif step_freq > 3:
                 activity = 'running'
                 confidence = 0.85
             elif step_freq > 1:
@@ -320,7 +531,7 @@ class ActivitySensor:
             }
             
         except Exception as e:
-            self.logger.error(f"Activity classification error: {e}")
+            logger.error(f"Activity classification error: {e}")
             return None
     
     def get_status(self) -> dict:
@@ -334,8 +545,8 @@ class ActivitySensor:
             'model': 'LSM6DS33' if not self.simulation_mode else 'Simulated',
             'simulation_mode': self.simulation_mode,
             'i2c_address': f"0x{self.i2c_address:02x}",
-            'buffer_size': len(self.accel_buffer),
-            'status': 'active' if self.simulation_mode or hasattr(self, 'sensor') else 'error'
+            'buffer_size': self._buffered,
+            'status': 'active' if self.simulation_mode or self._hw_ready else 'error'
         }
         
         if self.simulation_mode:
@@ -345,11 +556,11 @@ class ActivitySensor:
     
     def close(self):
         """Clean up sensor resources"""
-        if hasattr(self, 'sensor') and not self.simulation_mode:
+        if self._hw_ready:
             try:
                 # LSM6DS33 doesn't require explicit cleanup
                 pass
             except Exception as e:
-                self.logger.error(f"Error closing activity sensor: {e}")
+                logger.error(f"Error closing activity sensor: {e}")
         
-        self.logger.info("Activity sensor closed")
\ No newline at end of file
+        logger.info("Activity sensor closed")
\ No newline at end of file
@@ -4,9 +4,13 @@ Interfaces with MAX30102 pulse oximeter sensor for heart rate monitoring
 """
 
 import time
+import threading
 import numpy as np
-from typing import Optional, List
+from typing import Optional
 import logging
+from collections import deque
+
+from ._hr_kernels import bandpass_filter, calc_hr, find_peaks, prewarm
 
 try:
     import board
@@ -17,6 +21,8 @@ except ImportError:
     GPIO_AVAILABLE = False
     logging.warning("GPIO libraries not available, using simulation mode")
 
+logger = logging.getLogger(__name__)
+
 
 class HeartRateSensor:
     """Heart rate sensor using MAX30102 pulse oximeter"""
@@ -28,7 +34,7 @@ class HeartRateSensor:
             pin: GPIO pin number (for compatibility, not used with I2C)
             simulation_mode: Force simulation mode for testing
         """
-        self.logger = logging.getLogger(__name__)
+        self._hw_ready = False
         
         # Use simulation mode if GPIO not available or explicitly requested
         self.simulation_mode = simulation_mode or not GPIO_AVAILABLE
@@ -45,27 +51,41 @@ class HeartRateSensor:
                 self.sensor.setup_sensor()
                 self.sensor.set_mode_hr_only()  # Heart rate only mode
                 
-                self.logger.info("MAX30102 heart rate sensor initialized")
+                # Sample I2C in the background so read() never blocks on the bus
+                self._ir_ring = np.zeros(256, dtype=np.float32)
+                self._ir_count = 0
+                self._ring_lock = threading.Lock()
+                self._stop_event = threading.Event()
+                self._sampling_thread = threading.Thread(target=self._sampling_loop, daemon=True)
+                self._sampling_thread.start()
+                
+                self._hw_ready = True
+                logger.info("MAX30102 heart rate sensor initialized")
                 
             except Exception as e:
-                self.logger.warning(f"Failed to initialize hardware sensor: {e}")
-                self.logger.info("Falling back to simulation mode")
+                logger.warning(f"Failed to initialize hardware sensor: {e}")
+                logger.info("Falling back to simulation mode")
                 self.simulation_mode = True
         
         # Initialize simulation variables
         if self.simulation_mode:
             self.base_heart_rate = 70  # Normal resting heart rate
             self.time_offset = time.time()
-            self.logger.info("Heart rate sensor running in simulation mode")
+            self._rng = np.random.default_rng()
+            logger.info("Heart rate sensor running in simulation mode")
         
         # Data buffers for smoothing
-        self.raw_buffer = []
-        self.filtered_buffer = []
         self.buffer_size = 50
+        self.raw_buffer = deque(maxlen=self.buffer_size)
+        self.filtered_buffer = deque(maxlen=self.buffer_size)
         
         # Heart rate calculation variables
         self.last_peaks = []
         self.peak_threshold = 0.6
+        self._ma_window = 5
+        
+        # Compile/load the heart rate kernels before the first reading
+        prewarm()
         
     def read(self) -> Optional[np.ndarray]:
         """Read heart rate data
@@ -80,38 +100,43 @@ class HeartRateSensor:
                 return self._read_hardware()
                 
         except Exception as e:
-            self.logger.error(f"Error reading heart rate sensor: {e}")
+            logger.error(f"Error reading heart rate sensor: {e}")
             return None
     
+    def _sampling_loop(self):
+        """Continuously sample IR values into the ring buffer at 25Hz"""
+        while not self._stop_event.is_set():
+            try:
+                if self.sensor.available():
+                    red, ir = self.sensor.read_sensor()
+                    with self._ring_lock:
+                        self._ir_ring[self._ir_count % len(self._ir_ring)] = ir
+                        self._ir_count += 1
+                self._stop_event.wait(0.04)  # 25Hz sampling rate
+                
+            except Exception as e:
+                logger.error(f"Hardware sampling error: {e}")
+                self._stop_event.wait(1)
+    
     def _read_hardware(self) -> Optional[np.ndarray]:
         """Read data from actual MAX30102 sensor"""
         try:
-            # Read raw IR values
-            ir_data = []
-            red_data = []
+            # Snapshot the most recent ~1 second of IR samples (25Hz)
+            with self._ring_lock:
+                count = min(self._ir_count, 25)
+                if count == 0:
+                    return None
+                indices = np.arange(self._ir_count - count, self._ir_count) % len(self._ir_ring)
+                raw_signal = self._ir_ring[indices]
             
-            # Collect multiple samples for better accuracy
-            for _ in range(25):  # ~1 second at 25Hz
-                if self.sensor.available():
-                    red, ir = self.sensor.read_sensor()
-                    red_data.append(red)
-                    ir_data.append(ir)
-                time.sleep(0.04)  # 25Hz sampling rate
-            
-            if not ir_data:
-                return None
-            
-            # Use IR data for heart rate (more stable)
-            raw_signal = np.array(ir_data, dtype=np.float32)
-            
-            # Apply filtering and heart rate calculation
+            # Apply filtering and heart rate calculation (IR data is more stable)
             heart_rate = self._calculate_heart_rate(raw_signal)
             
             # Return structured data
             return np.array([heart_rate], dtype=np.float32)
             
         except Exception as e:
-            self.logger.error(f"Hardware sensor read error: {e}")
+            logger.error(f"Hardware sensor read error: {e}")
             return None
     
     def _read_simulated(self) -> np.ndarray:
@@ -131,69 +156,61 @@ class HeartRateSensor:
         
         return np.array([heart_rate], dtype=np.float32)
     
+    def read_batch(self, n_samples: int, sample_interval: float = 1.0) -> Optional[np.ndarray]:
+        """Generate a batch of simulated heart rate readings in one vectorized pass
+        
+        Args:
+            n_samples: Number of readings to generate
+            sample_interval: Seconds between readings
+            
+        Returns:
+            (n_samples, 1) float32 array of heart rates, or None if not in simulation mode
+        """
+        if not self.simulation_mode:
+            logger.error("Batch reads are only available in simulation mode")
+            return None
+        
+        t = (time.time() - self.time_offset) + np.arange(n_samples) * sample_interval
+        
+        # Same model as _read_simulated: breathing variation, noise and activity periods
+        heart_rate = self._rng.standard_normal(n_samples)
+        heart_rate *= 2
+        heart_rate += self.base_heart_rate
+        heart_rate += 10 * np.sin(t * 0.1)
+        heart_rate += 20 * np.maximum(0, np.sin(t * 0.05))
+        
+        # Clamp to realistic range
+        np.clip(heart_rate, 50, 180, out=heart_rate)
+        
+        return heart_rate.astype(np.float32).reshape(n_samples, 1)
+    
     def _calculate_heart_rate(self, raw_signal: np.ndarray) -> float:
         """Calculate heart rate from raw IR signal"""
         try:
-            # Apply bandpass filter to isolate heart rate frequencies (0.5-4 Hz)
-            filtered_signal = self._bandpass_filter(raw_signal)
-            
-            # Find peaks in the signal
-            peaks = self._find_peaks(filtered_signal)
-            
-            if len(peaks) >= 2:
-                # Calculate time between peaks
-                peak_intervals = np.diff(peaks) * 0.04  # Convert to seconds (25Hz)
-                
-                # Calculate heart rate from average interval
-                if len(peak_intervals) > 0:
-                    avg_interval = np.mean(peak_intervals)
-                    heart_rate = 60.0 / avg_interval  # Convert to BPM
-                    
-                    # Validate heart rate range
-                    if 40 <= heart_rate <= 200:
-                        return heart_rate
-            
-            # Return previous value or default if calculation fails
+            # Previous value or default if calculation fails
             if self.filtered_buffer:
-                return self.filtered_buffer[-1]
+                previous = float(self.filtered_buffer[-1])
             else:
-                return 70.0  # Default resting heart rate
+                previous = 70.0  # Default resting heart rate
+            
+            # Filter (0.5-4 Hz), peak detection and BPM in one compiled pass (25Hz samples)
+            return calc_hr(
+                np.ascontiguousarray(raw_signal, dtype=np.float32),
+                0.04, self.peak_threshold, self._ma_window, previous
+            )
                 
         except Exception as e:
-            self.logger.error(f"Heart rate calculation error: {e}")
+            logger.error(f"Heart rate calculation error: {e}")
             return 70.0
     
     def _bandpass_filter(self, signal: np.ndarray) -> np.ndarray:
         """Apply simple bandpass filter for heart rate frequencies"""
-        # Simple moving average filter to remove high frequency noise
-        window_size = 5
-        if len(signal) < window_size:
-            return signal
-        
-        filtered = np.convolve(signal, np.ones(window_size)/window_size, mode='same')
-        
-        # Remove DC component
-        filtered = filtered - np.mean(filtered)
-        
-        return filtered
+        # Moving average to remove high frequency noise, then DC removal
+        return bandpass_filter(np.ascontiguousarray(signal, dtype=np.float32), self._ma_window)
     
-    def _find_peaks(self, signal: np.ndarray) -> List[int]:
+    def _find_peaks(self, signal: np.ndarray) -> np.ndarray:
         """Find peaks in the filtered signal"""
-        peaks = []
-        
-        if len(signal) < 3:
-            return peaks
-        
-        # Simple peak detection
-        threshold = np.std(signal) * self.peak_threshold
-        
-        for i in range(1, len(signal) - 1):
-            if (signal[i] > signal[i-1] and 
-                signal[i] > signal[i+1] and 
-                signal[i] > threshold):
-                peaks.append(i)
-        
-        return peaks
+        return find_peaks(np.ascontiguousarray(signal, dtype=np.float64), self.peak_threshold)
     
     def get_status(self) -> dict:
         """Get sensor status information
@@ -206,16 +223,17 @@ class HeartRateSensor:
             'model': 'MAX30102' if not self.simulation_mode else 'Simulated',
             'simulation_mode': self.simulation_mode,
             'buffer_size': len(self.raw_buffer),
-            'status': 'active' if self.simulation_mode or hasattr(self, 'sensor') else 'error'
+            'status': 'active' if self.simulation_mode or self._hw_ready else 'error'
         }
     
     def close(self):
         """Clean up sensor resources"""
-        if hasattr(self, 'sensor') and not self.simulation_mode:
+        if self._hw_ready:
             try:
-                # MAX30102 doesn't require explicit cleanup
-                pass
+                # Stop background sampling; MAX30102 needs no other cleanup
+                self._stop_event.set()
+                self._sampling_thread.join(timeout=1)
             except Exception as e:
-                self.logger.error(f"Error closing heart rate sensor: {e}")
+                logger.error(f"Error closing heart rate sensor: {e}")
         
-        self.logger.info("Heart rate sensor closed")
\ No newline at end of file
+        logger.info("Heart rate sensor closed")
\ No newline at end of file
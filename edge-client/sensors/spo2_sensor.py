@@ -4,10 +4,13 @@ Interfaces with MAX30102 sensor for blood oxygen monitoring
 """
 
 import time
+from types import MappingProxyType
 import numpy as np
-from typing import Optional, Tuple
+from typing import Mapping, Optional, Tuple
 import logging
 
+from ._spo2_kernels import prewarm, spo2_from_signals
+
 try:
     import board
     import busio
@@ -17,19 +20,34 @@ except ImportError:
     GPIO_AVAILABLE = False
     logging.warning("GPIO libraries not available, using simulation mode")
 
+logger = logging.getLogger(__name__)
+
+# Samples read per FIFO burst (half the MAX30102's 32-sample FIFO, so it
+# never overflows while we wait)
+FIFO_BURST_SIZE = 16
+
+# MAX30102 sample period (25Hz)
+SAMPLE_INTERVAL = 1 / 25.0
+
+# Simulated readings generated per vectorized batch
+SIM_BATCH_SIZE = 64
+
 
 class SpO2Sensor:
     """SpO2 sensor using MAX30102 pulse oximeter"""
     
-    def __init__(self, i2c_address: int = 0x57, simulation_mode: bool = None):
+    def __init__(self, i2c_address: int = 0x57, simulation_mode: bool = None,
+                 sample_interval: float = 1.0):
         """Initialize SpO2 sensor
         
         Args:
             i2c_address: I2C address of the MAX30102 sensor
             simulation_mode: Force simulation mode for testing
+            sample_interval: Seconds between read() calls, used to space simulated readings
         """
-        self.logger = logging.getLogger(__name__)
+        self._hw_ready = False
         self.i2c_address = i2c_address
+        self.sample_interval = sample_interval
         
         # Use simulation mode if GPIO not available or explicitly requested
         self.simulation_mode = simulation_mode or not GPIO_AVAILABLE
@@ -46,31 +64,65 @@ class SpO2Sensor:
                 self.sensor.setup_sensor()
                 self.sensor.set_mode_spo2()  # SpO2 mode (red + IR)
                 
-                self.logger.info(f"MAX30102 SpO2 sensor initialized at address 0x{i2c_address:02x}")
+                # Drain the on-chip FIFO in bursts when the driver supports it
+                self._burst_reads = (hasattr(self.sensor, 'read_fifo_burst')
+                                     and hasattr(self.sensor, 'get_fifo_count'))
+                
+                self._hw_ready = True
+                logger.info(f"MAX30102 SpO2 sensor initialized at address 0x{i2c_address:02x}")
                 
             except Exception as e:
-                self.logger.warning(f"Failed to initialize hardware sensor: {e}")
-                self.logger.info("Falling back to simulation mode")
+                logger.warning(f"Failed to initialize hardware sensor: {e}")
+                logger.info("Falling back to simulation mode")
                 self.simulation_mode = True
         
         # Initialize simulation variables
         if self.simulation_mode:
             self.base_spo2 = 98.0  # Normal SpO2 level
             self.time_offset = time.time()
-            self.logger.info("SpO2 sensor running in simulation mode")
+            self._rng = np.random.default_rng()
+            
+            # Cached batch of simulated readings, consumed one per read()
+            self._sim_batch = np.empty((0, 1), dtype=np.float32)
+            self._sim_idx = 0
+            logger.info("SpO2 sensor running in simulation mode")
         
-        # Calibration constants for SpO2 calculation
-        self.calibration_coefficients = {
-            'a': -45.060,
-            'b': 30.354,
-            'c': 94.845
-        }
+        # Calibration constants for SpO2 calculation: SpO2 = a * R^2 + b * R + c
+        self._coef = np.array([-45.060, 30.354, 94.845], dtype=np.float64)
+        
+        # Compile/load the SpO2 kernel before the first reading
+        prewarm()
         
-        # Data buffers
-        self.red_buffer = []
-        self.ir_buffer = []
+        # Ring buffers of recent raw samples. Every sample is written at idx and
+        # idx + buffer_size, so the latest samples are always one contiguous slice.
         self.buffer_size = 100
+        self.red_buffer = np.zeros(2 * self.buffer_size, dtype=np.float32)
+        self.ir_buffer = np.zeros(2 * self.buffer_size, dtype=np.float32)
+        self._widx = 0
+        self._filled = 0
         
+    @property
+    def calibration_coefficients(self) -> Mapping[str, float]:
+        """Calibration constants (a, b, c), read-only; assign a dict to change them"""
+        a, b, c = self._coef
+        return MappingProxyType({'a': float(a), 'b': float(b), 'c': float(c)})
+    
+    @calibration_coefficients.setter
+    def calibration_coefficients(self, coefficients: Mapping[str, float]):
+        """Replace some or all of the calibration constants (a, b, c)"""
+        unknown = set(coefficients) - {'a', 'b', 'c'}
+        if unknown:
+            raise KeyError(f"Unknown calibration coefficients: {sorted(unknown)}")
+        
+        current = dict(self.calibration_coefficients)
+        current.update(coefficients)
+        self._coef = np.array([current['a'], current['b'], current['c']], dtype=np.float64)
+    
+    def _eval(self, R: float) -> float:
+        """Evaluate the calibration polynomial at R (Horner form)"""
+        a, b, c = self._coef
+        return (a * R + b) * R + c
+    
     def read(self) -> Optional[np.ndarray]:
         """Read SpO2 data
         
@@ -84,31 +136,39 @@ class SpO2Sensor:
                 return self._read_hardware()
                 
         except Exception as e:
-            self.logger.error(f"Error reading SpO2 sensor: {e}")
+            logger.error(f"Error reading SpO2 sensor: {e}")
             return None
     
     def _read_hardware(self) -> Optional[np.ndarray]:
         """Read data from actual MAX30102 sensor"""
         try:
-            red_samples = []
-            ir_samples = []
-            
             # Collect samples for SpO2 calculation
             sample_count = 50  # 2 seconds at 25Hz
+            red_samples = np.empty(sample_count, dtype=np.uint32)
+            ir_samples = np.empty(sample_count, dtype=np.uint32)
             
-            for _ in range(sample_count):
-                if self.sensor.available():
-                    red, ir = self.sensor.read_sensor()
-                    red_samples.append(red)
-                    ir_samples.append(ir)
-                time.sleep(0.04)  # 25Hz sampling rate
+            if self._burst_reads:
+                collected = self._read_fifo_bursts(red_samples, ir_samples)
+            else:
+                collected = 0
+                deadline = time.monotonic()
+                for _ in range(sample_count):
+                    if self.sensor.available():
+                        red_samples[collected], ir_samples[collected] = self.sensor.read_sensor()
+                        collected += 1
+                    
+                    # Sleep to the next absolute deadline so jitter doesn't accumulate
+                    deadline += SAMPLE_INTERVAL
+                    time.sleep(max(0.0, deadline - time.monotonic()))
             
-            if len(red_samples) < 10:  # Need minimum samples
+            if collected < 10:  # Need minimum samples
                 return None
             
-            # Convert to numpy arrays
-            red_signal = np.array(red_samples, dtype=np.float32)
-            ir_signal = np.array(ir_samples, dtype=np.float32)
+            # Convert to float arrays
+            red_signal = red_samples[:collected].astype(np.float32)
+            ir_signal = ir_samples[:collected].astype(np.float32)
+            
+            self._append_samples(red_signal, ir_signal)
             
             # Calculate SpO2
             spo2 = self._calculate_spo2(red_signal, ir_signal)
@@ -119,29 +179,99 @@ class SpO2Sensor:
                 return None
                 
         except Exception as e:
-            self.logger.error(f"Hardware sensor read error: {e}")
+            logger.error(f"Hardware sensor read error: {e}")
             return None
     
+    def _read_fifo_bursts(self, red_samples: np.ndarray, ir_samples: np.ndarray) -> int:
+        """Fill the sample arrays from the MAX30102 FIFO in burst reads
+        
+        Returns:
+            Number of samples collected before the arrays filled or the
+            sampling window elapsed
+        """
+        sample_count = len(red_samples)
+        end_time = time.monotonic() + sample_count * SAMPLE_INTERVAL + 0.1
+        collected = 0
+        
+        while collected < sample_count:
+            # Let the FIFO accumulate a burst before reading it
+            wanted = min(sample_count - collected, FIFO_BURST_SIZE)
+            pending = self.sensor.get_fifo_count()
+            if pending < wanted and time.monotonic() < end_time:
+                time.sleep((wanted - pending) * SAMPLE_INTERVAL)
+                continue
+            if pending == 0:
+                break
+            
+            count = min(pending, sample_count - collected)
+            red, ir = self.sensor.read_fifo_burst(count)
+            red_samples[collected:collected + count] = red
+            ir_samples[collected:collected + count] = ir
+            collected += count
+        
+        return collected
+    
+    def _append_samples(self, red_signal: np.ndarray, ir_signal: np.ndarray):
+        """Append blocks of red/IR samples to the ring buffers"""
+        red_signal = red_signal[-self.buffer_size:]
+        ir_signal = ir_signal[-self.buffer_size:]
+        
+        idx = (self._widx + np.arange(len(red_signal))) % self.buffer_size
+        self.red_buffer[idx] = red_signal
+        self.red_buffer[idx + self.buffer_size] = red_signal
+        self.ir_buffer[idx] = ir_signal
+        self.ir_buffer[idx + self.buffer_size] = ir_signal
+        
+        self._widx = (self._widx + len(red_signal)) % self.buffer_size
+        self._filled = min(self._filled + len(red_signal), self.buffer_size)
+    
+    def _recent(self, buffer: np.ndarray, count: int) -> np.ndarray:
+        """View of the last count samples in a ring buffer, oldest first"""
+        end = self._widx + self.buffer_size
+        return buffer[end - min(count, self._filled):end]
+    
     def _read_simulated(self) -> np.ndarray:
         """Generate simulated SpO2 data"""
-        current_time = time.time() - self.time_offset
+        # Refill the cache with a new batch starting at the current time
+        if self._sim_idx >= len(self._sim_batch):
+            self._sim_batch = self.read_batch(SIM_BATCH_SIZE, self.sample_interval)
+            self._sim_idx = 0
+        
+        spo2 = self._sim_batch[self._sim_idx]
+        self._sim_idx += 1
+        
+        return spo2
+    
+    def read_batch(self, n_samples: int, sample_interval: float = 1.0) -> Optional[np.ndarray]:
+        """Generate a batch of simulated SpO2 readings in one vectorized pass
+        
+        Args:
+            n_samples: Number of readings to generate
+            sample_interval: Seconds between readings
+            
+        Returns:
+            (n_samples, 1) float32 array of SpO2 percentages, or None if not in simulation mode
+        """
+        if not self.simulation_mode:
+            logger.error("Batch reads are only available in simulation mode")
+            return None
         
-        # Generate realistic SpO2 variation
-        # Base SpO2 with small natural variation
-        variation = 1.0 * np.sin(current_time * 0.05)  # Slow breathing variation
-        noise = 0.3 * np.random.normal()  # Small random noise
+        t = (time.time() - self.time_offset) + np.arange(n_samples) * sample_interval
         
-        # Occasional drops (simulating brief interruptions)
-        if np.random.random() < 0.01:  # 1% chance
-            drop = np.random.uniform(2, 5)  # Drop by 2-5%
-            variation -= drop
+        # Base SpO2 with slow breathing variation and small random noise
+        spo2 = self._rng.standard_normal(n_samples)
+        spo2 *= 0.3
+        spo2 += self.base_spo2
+        spo2 += np.sin(t * 0.05)
         
-        spo2 = self.base_spo2 + variation + noise
+        # Occasional drops of 2-5% (simulating brief interruptions)
+        drops = self._rng.random(n_samples) < 0.01
+        spo2[drops] -= self._rng.uniform(2, 5, np.count_nonzero(drops))
         
         # Clamp to realistic range
-        spo2 = np.clip(spo2, 85, 100)
+        np.clip(spo2, 85, 100, out=spo2)
         
-        return np.array([spo2], dtype=np.float32)
+        return spo2.astype(np.float32).reshape(n_samples, 1)
     
     def _calculate_spo2(self, red_signal: np.ndarray, ir_signal: np.ndarray) -> Optional[float]:
         """Calculate SpO2 from red and IR signals
@@ -154,37 +284,21 @@ class SpO2Sensor:
             SpO2 percentage or None if calculation fails
         """
         try:
-            # Remove DC component and calculate AC/DC ratios
-            red_ac, red_dc = self._calculate_ac_dc(red_signal)
-            ir_ac, ir_dc = self._calculate_ac_dc(ir_signal)
-            
-            # Avoid division by zero
-            if red_dc == 0 or ir_dc == 0 or ir_ac == 0:
-                return None
-            
-            # Calculate ratio of ratios (R)
-            red_ratio = red_ac / red_dc
-            ir_ratio = ir_ac / ir_dc
+            # AC/DC ratios, ratio of ratios and calibration in one compiled pass
+            a, b, c = self._coef
+            spo2 = spo2_from_signals(
+                np.ascontiguousarray(red_signal, dtype=np.float32),
+                np.ascontiguousarray(ir_signal, dtype=np.float32),
+                a, b, c
+            )
             
-            if ir_ratio == 0:
-                return None
-                
-            R = red_ratio / ir_ratio
-            
-            # Apply calibration formula
-            # SpO2 = a * R^2 + b * R + c
-            spo2 = (self.calibration_coefficients['a'] * R * R + 
-                   self.calibration_coefficients['b'] * R + 
-                   self.calibration_coefficients['c'])
-            
-            # Validate SpO2 range
-            if 70 <= spo2 <= 100:
-                return float(spo2)
-            else:
+            # NaN marks a flat signal or an SpO2 outside the valid range
+            if np.isnan(spo2):
                 return None
+            return float(spo2)
                 
         except Exception as e:
-            self.logger.error(f"SpO2 calculation error: {e}")
+            logger.error(f"SpO2 calculation error: {e}")
             return None
     
     def _calculate_ac_dc(self, signal: np.ndarray) -> Tuple[float, float]:
@@ -196,11 +310,18 @@ class SpO2Sensor:
         Returns:
             Tuple of (AC component, DC component)
         """
+        # Sum and sum of squares in one pass each (float64 avoids cancellation
+        # at raw ADC magnitudes)
+        samples = np.asarray(signal, dtype=np.float64)
+        n = samples.size
+        total = samples.sum()
+        total_sq = np.dot(samples, samples)
+        
         # DC component is the mean
-        dc_component = np.mean(signal)
+        dc_component = total / n
         
         # AC component is the standard deviation (RMS of AC signal)
-        ac_component = np.std(signal)
+        ac_component = np.sqrt(max(total_sq / n - dc_component * dc_component, 0.0))
         
         return ac_component, dc_component
     
@@ -224,19 +345,17 @@ class SpO2Sensor:
                 
                 # Simple linear calibration adjustment
                 # This is a simplified approach - production systems use more sophisticated calibration
-                current_spo2 = (self.calibration_coefficients['a'] * R * R + 
-                               self.calibration_coefficients['b'] * R + 
-                               self.calibration_coefficients['c'])
+                current_spo2 = self._eval(R)
                 
                 offset = known_spo2 - current_spo2
                 
                 # Adjust the constant term
-                self.calibration_coefficients['c'] += offset
+                self._coef[2] += offset
                 
-                self.logger.info(f"Calibrated SpO2 sensor with offset: {offset:.2f}")
+                logger.info(f"Calibrated SpO2 sensor with offset: {offset:.2f}")
                 
         except Exception as e:
-            self.logger.error(f"Calibration error: {e}")
+            logger.error(f"Calibration error: {e}")
     
     def get_signal_quality(self) -> dict:
         """Get signal quality metrics
@@ -260,10 +379,10 @@ class SpO2Sensor:
             'motion_detected': False
         }
         
-        if len(self.red_buffer) > 10 and len(self.ir_buffer) > 10:
+        if self._filled > 10:
             # Simple quality metrics based on signal stability
-            red_stability = 1.0 / (1.0 + np.std(self.red_buffer[-20:]))
-            ir_stability = 1.0 / (1.0 + np.std(self.ir_buffer[-20:]))
+            red_stability = 1.0 / (1.0 + np.std(self._recent(self.red_buffer, 20)))
+            ir_stability = 1.0 / (1.0 + np.std(self._recent(self.ir_buffer, 20)))
             
             quality['red_signal_quality'] = min(red_stability, 1.0)
             quality['ir_signal_quality'] = min(ir_stability, 1.0)
@@ -292,17 +411,17 @@ class SpO2Sensor:
             'model': 'MAX30102' if not self.simulation_mode else 'Simulated',
             'simulation_mode': self.simulation_mode,
             'i2c_address': f"0x{self.i2c_address:02x}",
-            'buffer_size': len(self.red_buffer),
-            'status': 'active' if self.simulation_mode or hasattr(self, 'sensor') else 'error'
+            'buffer_size': self._filled,
+            'status': 'active' if self.simulation_mode or self._hw_ready else 'error'
         }
     
     def close(self):
         """Clean up sensor resources"""
-        if hasattr(self, 'sensor') and not self.simulation_mode:
+        if self._hw_ready:
             try:
                 # MAX30102 doesn't require explicit cleanup
                 pass
             except Exception as e:
-                self.logger.error(f"Error closing SpO2 sensor: {e}")
+                logger.error(f"Error closing SpO2 sensor: {e}")
         
-        self.logger.info("SpO2 sensor closed")
\ No newline at end of file
+        logger.info("SpO2 sensor closed")
\ No newline at end of file
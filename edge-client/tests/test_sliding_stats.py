@@ -0,0 +1,36 @@
+"""
+Tests for the incremental activity window statistics
+"""
+
+import numpy as np
+import pytest
+
+from sensors.activity_sensor import SlidingStats
+
+
+@pytest.mark.parametrize('size', [1, 5, 50])
+def test_matches_numpy_over_sliding_window(size):
+    rng = np.random.default_rng(7)
+    values = rng.normal(9.81, 2.0, 400)
+    stats = SlidingStats(size)
+    
+    for i, value in enumerate(values):
+        stats.push(float(value))
+        window = values[max(0, i + 1 - size):i + 1]
+        
+        assert stats.count == len(window)
+        np.testing.assert_allclose(stats.window(), window)
+        assert stats.mean == pytest.approx(window.mean(), rel=1e-9)
+        assert stats.std == pytest.approx(window.std(), rel=1e-6, abs=1e-9)
+        assert stats.max == window.max()
+        assert stats.min == window.min()
+        assert stats.energy == pytest.approx(np.sum(window * window), rel=1e-9)
+
+
+def test_constant_signal_has_zero_std():
+    stats = SlidingStats(10)
+    for _ in range(25):
+        stats.push(9.81)
+    
+    assert stats.std == pytest.approx(0.0, abs=1e-9)
+    assert stats.max == stats.min == 9.81
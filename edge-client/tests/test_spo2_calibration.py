@@ -0,0 +1,34 @@
+"""
+Tests for the SpO2 calibration constants
+"""
+
+import pytest
+
+from sensors.spo2_sensor import SpO2Sensor
+
+
+def test_coefficients_are_read_only():
+    sensor = SpO2Sensor({})
+    
+    with pytest.raises(TypeError):
+        sensor.calibration_coefficients['c'] = 100.0
+    assert sensor.calibration_coefficients['c'] == pytest.approx(94.845)
+
+
+def test_assigning_coefficients_updates_the_curve():
+    sensor = SpO2Sensor({})
+    sensor.calibration_coefficients = {'a': 0.0, 'b': -25.0, 'c': 110.0}
+    
+    assert dict(sensor.calibration_coefficients) == {'a': 0.0, 'b': -25.0, 'c': 110.0}
+    assert sensor._eval(0.4) == pytest.approx(100.0)
+    
+    sensor.calibration_coefficients = {'c': 105.0}
+    assert sensor.calibration_coefficients['b'] == -25.0
+    assert sensor._eval(0.4) == pytest.approx(95.0)
+
+
+def test_unknown_coefficient_is_rejected():
+    sensor = SpO2Sensor({})
+    
+    with pytest.raises(KeyError):
+        sensor.calibration_coefficients = {'d': 1.0}
@@ -7,30 +7,49 @@ Implements secure aggregation and differential privacy for federated learning
 import os
 import json
 import time
+import base64
+import hashlib
 import threading
-from typing import Dict, List, Optional, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Any, Union
 from datetime import datetime, timedelta
 import logging
 
-from flask import Flask, request, jsonify, g
+import orjson
+from flask import Flask, Response, request, jsonify, g
+from flask.json.provider import JSONProvider
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError
 import numpy as np
 import redis
 from celery import Celery
-from cryptography.fernet import Fernet
+import zstandard as zstd
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from prometheus_client import Counter, Histogram, Gauge, generate_latest
 import tensorflow as tf
 
-from federated.aggregator import FederatedAggregator
 from federated.privacy import DifferentialPrivacyManager
-from utils.encryption import EncryptionManager
 from utils.logger import setup_logger
 from models.database import db, Device, ModelUpdate, AggregationRound
+from migrations import run_migrations
+from model_updates import pack_model_update, unpack_model_update, federated_average
+
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson (NumPy arrays serialize natively)"""
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
 
 # Initialize Flask app
 app = Flask(__name__)
 app.config.from_object('config.DevelopmentConfig')
+app.json = OrjsonProvider(app)
 
 # Initialize extensions
 CORS(app)
@@ -44,13 +63,98 @@ celery.conf.update(app.config)
 redis_client = redis.Redis.from_url(app.config['REDIS_URL'])
 
 # Initialize components
-encryption_manager = EncryptionManager(app.config.get('ENCRYPTION_KEY'))
-federated_aggregator = FederatedAggregator(app.config)
 privacy_manager = DifferentialPrivacyManager(app.config)
 
 # Setup logging
 logger = setup_logger(app.config.get('LOG_LEVEL', 'INFO'))
 
+# Redis key holding the serialized /api/v1/global-models response
+GLOBAL_MODELS_CACHE_KEY = 'global_models:latest'
+
+# Seconds the cached response lives before it is rebuilt from the database
+GLOBAL_MODELS_CACHE_TTL = 3600
+
+# Seconds a device's active status is cached in Redis
+DEVICE_CACHE_TTL = 60
+
+# Redis hash of device_id -> last seen unix time, flushed to the DB by flush_last_seen
+LAST_SEEN_KEY = 'last_seen'
+
+# Seconds between scheduled last seen flushes (Celery beat)
+LAST_SEEN_FLUSH_SECONDS = app.config.get('LAST_SEEN_FLUSH_SECONDS', 60)
+
+# Redis key refreshed by every flush; once it expires, flushes are overdue (no
+# beat running) and the next request flushes inline
+LAST_SEEN_FLUSHED_KEY = 'last_seen:flushed'
+
+# Attempts at claiming the next aggregation round number
+ROUND_NUMBER_ATTEMPTS = 5
+
+
+def is_device_active(device_id: str) -> bool:
+    """Check that a device is registered and active, using the Redis status cache"""
+    cache_key = f"dev:{device_id}"
+    if redis_client.get(cache_key) == b'active':
+        return True
+    
+    device = Device.query.filter_by(device_id=device_id, status='active').first()
+    if not device:
+        return False
+    
+    redis_client.setex(cache_key, DEVICE_CACHE_TTL, 'active')
+    return True
+
+
+def record_device_seen(device_id: str):
+    """Record that a device contacted the server; persisted in batches by flush_last_seen"""
+    now = int(time.time())
+    pipe = redis_client.pipeline()
+    pipe.hset(LAST_SEEN_KEY, device_id, now)
+    pipe.set(LAST_SEEN_FLUSHED_KEY, now, nx=True, ex=2 * LAST_SEEN_FLUSH_SECONDS)
+    _, overdue = pipe.execute()
+    
+    # Only the request that claims the expired key flushes, at most once per window
+    if overdue:
+        flush_last_seen()
+
+
+def create_health_data_cipher(key: Optional[str]) -> Optional[AESGCM]:
+    """Create the AES-256-GCM cipher shared with edge devices"""
+    if not key:
+        logger.warning("No ENCRYPTION_KEY configured, health data cannot be decrypted")
+        return None
+    
+    # Same derivation as the edge client: SHA-256 of the shared secret
+    return AESGCM(hashlib.sha256(key.encode('utf-8')).digest())
+
+
+health_data_cipher = create_health_data_cipher(app.config.get('ENCRYPTION_KEY'))
+
+
+def decrypt_health_data(encrypted_data: Union[str, bytes], device_id: str, compression: Optional[str] = None) -> List[Dict]:
+    """Decrypt an edge batch (base64 of nonce || ciphertext) bound to device_id
+    
+    Args:
+        encrypted_data: Base64 payload from the edge device
+        device_id: Device id, authenticated as associated data
+        compression: 'zstd' if the batch was compressed before encryption
+        
+    Returns:
+        Decrypted list of health data points
+    """
+    if health_data_cipher is None:
+        raise RuntimeError("No encryption key configured")
+    
+    blob = base64.b64decode(encrypted_data)
+    nonce, ciphertext = blob[:12], blob[12:]
+    batch_bytes = health_data_cipher.decrypt(nonce, ciphertext, str(device_id).encode('utf-8'))
+    
+    if compression == 'zstd':
+        batch_bytes = zstd.ZstdDecompressor().decompress(batch_bytes)
+    
+    return orjson.loads(batch_bytes)
+
+
 # Prometheus metrics
 metrics = {
     'requests_total': Counter('federation_requests_total', 'Total requests', ['method', 'endpoint']),
@@ -60,12 +164,35 @@ metrics = {
     'request_duration': Histogram('request_duration_seconds', 'Request duration', ['endpoint'])
 }
 
+# Metric children bound once per route so requests skip the labels() lookup
+_ROUTES = (
+    ('GET', 'health_check'),
+    ('POST', 'register_device'),
+    ('POST', 'receive_health_data'),
+    ('POST', 'receive_model_updates'),
+    ('GET', 'download_global_models'),
+    ('GET', 'prometheus_metrics')
+)
+_REQ_COUNTERS = {
+    (method, endpoint): metrics['requests_total'].labels(method=method, endpoint=endpoint)
+    for method, endpoint in _ROUTES
+}
+_REQ_DURATIONS = {
+    endpoint: metrics['request_duration'].labels(endpoint=endpoint)
+    for _, endpoint in _ROUTES
+}
+
 
 @app.before_request
 def before_request():
     """Before request hook for metrics and logging"""
     g.start_time = time.time()
-    metrics['requests_total'].labels(method=request.method, endpoint=request.endpoint).inc()
+    
+    counter = _REQ_COUNTERS.get((request.method, request.endpoint))
+    if counter is None:
+        # Unrouted requests, CORS preflights, etc.
+        counter = metrics['requests_total'].labels(method=request.method, endpoint=request.endpoint)
+    counter.inc()
 
 
 @app.after_request
@@ -73,7 +200,11 @@ def after_request(response):
     """After request hook for metrics"""
     if hasattr(g, 'start_time'):
         duration = time.time() - g.start_time
-        metrics['request_duration'].labels(endpoint=request.endpoint).observe(duration)
+        
+        histogram = _REQ_DURATIONS.get(request.endpoint)
+        if histogram is None:
+            histogram = metrics['request_duration'].labels(endpoint=request.endpoint)
+        histogram.observe(duration)
     return response
 
 
@@ -137,6 +268,9 @@ def register_device():
         
         db.session.commit()
         
+        # Refresh the cached device status
+        redis_client.setex(f"dev:{device_id}", DEVICE_CACHE_TTL, 'active')
+        
         # Update active devices metric
         active_count = Device.query.filter_by(status='active').count()
         metrics['active_devices'].set(active_count)
@@ -159,7 +293,13 @@ def register_device():
 
 @app.route('/api/v1/health-data', methods=['POST'])
 def receive_health_data():
-    """Receive encrypted health data from edge devices"""
+    """Receive encrypted health data from edge devices
+    
+    The body is parsed once here; the ciphertext is decrypted by the
+    process_health_data worker. A 200 therefore means the batch was queued:
+    payloads that fail to decrypt are logged and dropped by the worker rather
+    than rejected with a 400.
+    """
     try:
         data = request.get_json()
         
@@ -167,30 +307,21 @@ def receive_health_data():
             return jsonify({'error': 'device_id and encrypted_data are required'}), 400
         
         device_id = data['device_id']
-        encrypted_data = data['encrypted_data']
         
         # Verify device exists and is active
-        device = Device.query.filter_by(device_id=device_id, status='active').first()
-        if not device:
+        if not is_device_active(device_id):
             return jsonify({'error': 'Device not found or inactive'}), 404
         
-        # Decrypt health data
-        try:
-            decrypted_data = encryption_manager.decrypt_data(encrypted_data)
-        except Exception as e:
-            logger.error(f"Decryption failed for device {device_id}: {e}")
-            return jsonify({'error': 'Invalid encrypted data'}), 400
+        # Store only the ciphertext for processing, so the worker decrypts it
+        # without parsing the request body a second time
+        cache_key = f"health_data:{device_id}:{time.time_ns()}"
+        redis_client.setex(cache_key, 3600, data['encrypted_data'])  # 1 hour TTL
         
-        # Store data for processing
-        cache_key = f"health_data:{device_id}:{int(time.time())}"
-        redis_client.setex(cache_key, 3600, json.dumps(decrypted_data))  # 1 hour TTL
-        
-        # Update device last seen
-        device.last_seen = datetime.utcnow()
-        db.session.commit()
+        # Update device last seen off the request path
+        record_device_seen(device_id)
         
         # Trigger async processing
-        process_health_data.delay(device_id, decrypted_data)
+        process_health_data.delay(device_id, cache_key, data.get('compression'))
         
         logger.info(f"Received health data from device {device_id}, batch size: {data.get('batch_size', 1)}")
         
@@ -217,20 +348,23 @@ def receive_model_updates():
         model_updates = data['model_updates']
         
         # Verify device
-        device = Device.query.filter_by(device_id=device_id, status='active').first()
-        if not device:
+        if not is_device_active(device_id):
             return jsonify({'error': 'Device not found or inactive'}), 404
         
-        # Store model updates
-        for model_name, update_data in model_updates.items():
-            model_update = ModelUpdate(
-                device_id=device_id,
-                model_name=model_name,
-                update_data=json.dumps(update_data),
-                samples_count=update_data.get('samples_count', 0),
-                created_at=datetime.utcnow()
-            )
-            db.session.add(model_update)
+        # Store model updates in a single bulk INSERT
+        created_at = datetime.utcnow()
+        rows = [
+            {
+                'device_id': device_id,
+                'model_name': model_name,
+                'update_data': pack_model_update(update_data),
+                'samples_count': update_data.get('samples_count', 0),
+                'created_at': created_at
+            }
+            for model_name, update_data in model_updates.items()
+        ]
+        if rows:
+            db.session.execute(ModelUpdate.__table__.insert(), rows)
         
         db.session.commit()
         
@@ -261,10 +395,18 @@ def download_global_models():
             return jsonify({'error': 'device_id parameter is required'}), 400
         
         # Verify device
-        device = Device.query.filter_by(device_id=device_id, status='active').first()
-        if not device:
+        if not is_device_active(device_id):
             return jsonify({'error': 'Device not found or inactive'}), 404
         
+        # Update device last seen off the request path
+        record_device_seen(device_id)
+        
+        # Serve the cached response body when available
+        payload = redis_client.get(GLOBAL_MODELS_CACHE_KEY)
+        if payload:
+            logger.info(f"Device {device_id} downloaded cached global models")
+            return Response(payload, status=200, mimetype='application/json')
+        
         # Get latest aggregation round
         latest_round = AggregationRound.query.filter_by(status='completed').order_by(
             AggregationRound.completed_at.desc()
@@ -273,27 +415,39 @@ def download_global_models():
         if not latest_round:
             return jsonify({'error': 'No global models available'}), 404
         
-        # Get global models
-        global_models = json.loads(latest_round.global_models)
-        
-        # Update device last seen
-        device.last_seen = datetime.utcnow()
-        db.session.commit()
+        # Don't overwrite a newer round cached by an aggregation that finished meanwhile
+        payload = cache_global_models(latest_round, only_if_missing=True)
         
         logger.info(f"Device {device_id} downloaded global models from round {latest_round.round_number}")
         
-        return jsonify({
-            'round_number': latest_round.round_number,
-            'global_models': global_models,
-            'created_at': latest_round.completed_at.isoformat(),
-            'participating_devices': latest_round.participating_devices
-        }), 200
+        return Response(payload, status=200, mimetype='application/json')
         
     except Exception as e:
         logger.error(f"Global models download error: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
 
+def cache_global_models(aggregation_round: AggregationRound, only_if_missing: bool = False) -> bytes:
+    """Serialize the global models response for a completed round and cache it in Redis
+    
+    Args:
+        aggregation_round: Completed round to serve
+        only_if_missing: Leave an existing cached response in place (SET NX)
+        
+    Returns:
+        The serialized response body
+    """
+    payload = orjson.dumps({
+        'round_number': aggregation_round.round_number,
+        'global_models': orjson.loads(aggregation_round.global_models),
+        'created_at': aggregation_round.completed_at.isoformat(),
+        'participating_devices': aggregation_round.participating_devices
+    })
+    
+    redis_client.set(GLOBAL_MODELS_CACHE_KEY, payload, ex=GLOBAL_MODELS_CACHE_TTL, nx=only_if_missing)
+    return payload
+
+
 @app.route('/metrics', methods=['GET'])
 def prometheus_metrics():
     """Prometheus metrics endpoint"""
@@ -301,11 +455,29 @@ def prometheus_metrics():
 
 
 @celery.task
-def process_health_data(device_id: str, health_data: List[Dict]):
-    """Process health data from edge devices"""
+def process_health_data(device_id: str, cache_key: str, compression: Optional[str] = None):
+    """Process health data from edge devices
+    
+    Args:
+        device_id: Device that sent the data
+        cache_key: Redis key of the batch's base64 ciphertext
+        compression: 'zstd' if the batch was compressed before encryption
+    """
     try:
         logger.info(f"Processing health data from device {device_id}")
         
+        encrypted_data = redis_client.get(cache_key)
+        if encrypted_data is None:
+            logger.warning(f"Health data {cache_key} expired before processing")
+            return False
+        
+        # Decrypt once, here rather than on the request thread
+        try:
+            health_data = decrypt_health_data(encrypted_data, device_id, compression)
+        except Exception as e:
+            logger.error(f"Decryption failed for device {device_id}: {e}")
+            return False
+        
         # Here you would implement health data analysis
         # For now, we'll just log the data
         for data_point in health_data:
@@ -329,6 +501,47 @@ def process_health_data(device_id: str, health_data: List[Dict]):
         return False
 
 
+@celery.task
+def flush_last_seen():
+    """Write last seen times collected in Redis to the devices table in one UPDATE"""
+    try:
+        # Take and clear the pending times atomically
+        pipe = redis_client.pipeline()
+        pipe.hgetall(LAST_SEEN_KEY)
+        pipe.delete(LAST_SEEN_KEY)
+        pipe.set(LAST_SEEN_FLUSHED_KEY, int(time.time()), ex=2 * LAST_SEEN_FLUSH_SECONDS)
+        pending, _, _ = pipe.execute()
+        
+        if not pending:
+            return 0
+        
+        last_seen = {
+            device_id.decode('utf-8'): datetime.utcfromtimestamp(int(ts))
+            for device_id, ts in pending.items()
+        }
+        
+        db.session.execute(
+            Device.__table__.update()
+            .where(Device.device_id.in_(list(last_seen)))
+            .values(last_seen=db.case(last_seen, value=Device.device_id))
+        )
+        db.session.commit()
+        
+        return len(last_seen)
+        
+    except Exception as e:
+        logger.error(f"Error flushing device last seen times: {e}")
+        return 0
+
+
+celery.conf.beat_schedule = {
+    'flush-last-seen': {
+        'task': flush_last_seen.name,
+        'schedule': LAST_SEEN_FLUSH_SECONDS
+    }
+}
+
+
 @celery.task
 def trigger_health_alert(device_id: str, alert_type: str, data: Dict):
     """Trigger health alert for critical conditions"""
@@ -349,7 +562,7 @@ def trigger_health_alert(device_id: str, alert_type: str, data: Dict):
         }
         
         # Store in Redis for real-time dashboard
-        redis_client.lpush('health_alerts', json.dumps(alert_data))
+        redis_client.lpush('health_alerts', orjson.dumps(alert_data))
         redis_client.ltrim('health_alerts', 0, 999)  # Keep last 1000 alerts
         
         return True
@@ -365,11 +578,13 @@ def check_aggregation_readiness():
     try:
         min_devices = app.config.get('MIN_DEVICES_FOR_AGGREGATION', 3)
         
-        # Count recent model updates (last 24 hours)
+        # Count devices with recent model updates (last 24 hours) in one aggregate
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
-        recent_updates = db.session.query(ModelUpdate.device_id).filter(
+        recent_updates = db.session.query(
+            db.func.count(ModelUpdate.device_id.distinct())
+        ).filter(
             ModelUpdate.created_at >= cutoff_time
-        ).distinct().count()
+        ).scalar()
         
         if recent_updates >= min_devices:
             logger.info(f"Aggregation ready with {recent_updates} devices")
@@ -390,16 +605,28 @@ def start_aggregation_round():
     try:
         logger.info("Starting new aggregation round")
         
-        # Create new aggregation round
-        round_number = db.session.query(AggregationRound).count() + 1
-        
-        aggregation_round = AggregationRound(
-            round_number=round_number,
-            status='in_progress',
-            started_at=datetime.utcnow()
-        )
-        db.session.add(aggregation_round)
-        db.session.commit()
+        # Create new aggregation round (MAX is an index lookup, not a table scan),
+        # retrying if a concurrent round claims the same number first
+        for _ in range(ROUND_NUMBER_ATTEMPTS):
+            round_number = db.session.query(
+                db.func.coalesce(db.func.max(AggregationRound.round_number), 0)
+            ).scalar() + 1
+            
+            aggregation_round = AggregationRound(
+                round_number=round_number,
+                status='in_progress',
+                started_at=datetime.utcnow()
+            )
+            db.session.add(aggregation_round)
+            try:
+                db.session.commit()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                logger.warning(f"Aggregation round {round_number} already claimed, retrying")
+        else:
+            logger.error(f"Could not claim an aggregation round number after {ROUND_NUMBER_ATTEMPTS} attempts")
+            return False
         
         # Get recent model updates
         cutoff_time = datetime.utcnow() - timedelta(hours=24)
@@ -420,46 +647,70 @@ def start_aggregation_round():
         participating_devices = set()
         
         for update in model_updates:
+            # Skip rows that can't be decoded rather than failing the round
+            try:
+                update_data = unpack_model_update(update.update_data)
+            except Exception as e:
+                logger.error(f"Skipping undecodable model update {update.id} from device {update.device_id}: {e}")
+                continue
+            
             model_name = update.model_name
             if model_name not in updates_by_model:
                 updates_by_model[model_name] = []
             
             updates_by_model[model_name].append({
                 'device_id': update.device_id,
-                'update_data': json.loads(update.update_data),
+                'update_data': update_data,
                 'samples_count': update.samples_count
             })
             participating_devices.add(update.device_id)
         
-        # Perform federated aggregation
-        global_models = {}
+        if not updates_by_model:
+            logger.warning("No decodable model updates available for aggregation")
+            aggregation_round.status = 'failed'
+            aggregation_round.error_message = 'No decodable model updates available'
+            db.session.commit()
+            return False
         
+        # Apply differential privacy (sequentially, the privacy manager tracks budget state)
+        private_by_model = {}
         for model_name, updates in updates_by_model.items():
             logger.info(f"Aggregating {len(updates)} updates for model {model_name}")
-            
-            # Apply differential privacy
-            private_updates = privacy_manager.add_noise_to_updates(updates)
-            
-            # Perform federated averaging
-            global_model = federated_aggregator.aggregate_model_updates(
-                model_name, private_updates
-            )
-            
-            if global_model:
-                global_models[model_name] = global_model
+            private_by_model[model_name] = privacy_manager.add_noise_to_updates(updates)
+        
+        # Perform federated averaging per model in parallel; the BLAS matrix-vector
+        # product in federated_average releases the GIL
+        max_workers = max(1, min(len(private_by_model), os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(federated_average, private_by_model.values())
+            global_models = {
+                model_name: global_model
+                for model_name, global_model in zip(private_by_model, results)
+                if global_model
+            }
         
         # Save aggregation results
-        aggregation_round.global_models = json.dumps(global_models)
+        aggregation_round.global_models = orjson.dumps(
+            global_models, option=orjson.OPT_SERIALIZE_NUMPY
+        ).decode('utf-8')
         aggregation_round.participating_devices = len(participating_devices)
         aggregation_round.status = 'completed'
         aggregation_round.completed_at = datetime.utcnow()
         
-        # Mark updates as aggregated
-        for update in model_updates:
-            update.aggregated = True
+        # Mark updates as aggregated in a single UPDATE
+        ModelUpdate.query.filter(
+            ModelUpdate.id.in_([update.id for update in model_updates])
+        ).update({'aggregated': True}, synchronize_session=False)
         
         db.session.commit()
         
+        # Replace the cached global models response; the round is already committed,
+        # so a Redis failure must not mark it failed (downloads rebuild the cache)
+        try:
+            cache_global_models(aggregation_round)
+        except Exception as e:
+            logger.error(f"Failed to cache global models for round {round_number}: {e}")
+        
         # Update metrics
         metrics['aggregation_rounds'].inc()
         
@@ -486,6 +737,12 @@ def create_tables():
         logger.info("Database tables created")
 
 
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply schema migrations to an existing database (run once per deploy)"""
+    run_migrations(db.engine)
+
+
 if __name__ == '__main__':
     # Create tables
     create_tables()
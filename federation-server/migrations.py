@@ -0,0 +1,106 @@
+"""
+Database Migrations
+Schema changes for databases created by earlier releases. They are applied
+explicitly, once per deploy, with `flask --app app migrate` before the new
+server and workers start; every migration checks the schema first, so reruns
+are no-ops.
+"""
+
+import logging
+
+from sqlalchemy import inspect, select, text
+
+from models.database import ModelUpdate, AggregationRound
+
+logger = logging.getLogger(__name__)
+
+
+def model_update_binary(engine) -> bool:
+    """Convert a text update_data column to binary in place
+    
+    Legacy JSON rows keep their bytes, so unpack_model_update still reads them.
+    """
+    table = ModelUpdate.__table__.name
+    columns = {column['name']: column for column in inspect(engine).get_columns(table)}
+    column = columns.get('update_data')
+    if column is None or column['type'].python_type is bytes:
+        return False
+    
+    dialect = engine.dialect.name
+    if dialect == 'mysql':
+        null = 'NULL' if column['nullable'] else 'NOT NULL'
+        statement = f"ALTER TABLE {table} MODIFY update_data LONGBLOB {null}"
+    elif dialect == 'postgresql':
+        statement = f"ALTER TABLE {table} ALTER COLUMN update_data TYPE BYTEA USING convert_to(update_data, 'UTF8')"
+    else:
+        logger.warning(f"Cannot migrate {table}.update_data to binary on {dialect}")
+        return False
+    
+    with engine.begin() as connection:
+        connection.execute(text(statement))
+    return True
+
+
+def _create_missing_indexes(engine, table, names) -> bool:
+    """Create the model's named indexes that an existing table lacks"""
+    existing = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+    missing = [index for index in table.indexes if index.name in names and index.name not in existing]
+    for index in missing:
+        index.create(engine)
+    return bool(missing)
+
+
+def query_indexes(engine) -> bool:
+    """Add the aggregation and global model download query indexes"""
+    created = _create_missing_indexes(engine, ModelUpdate.__table__, {'ix_mu_created_agg'})
+    return _create_missing_indexes(engine, AggregationRound.__table__, {'ix_ar_status_completed'}) or created
+
+
+def unique_round_numbers(engine) -> bool:
+    """Renumber duplicate round numbers, then add the unique round number index
+    
+    Rounds that share a number (from the old MAX()+1 race) keep the lowest id
+    on it; the others are moved past the current maximum, in id order.
+    """
+    table = AggregationRound.__table__
+    existing = {index['name'] for index in inspect(engine).get_indexes(table.name)}
+    if 'ux_ar_round_number' in existing:
+        return False
+    
+    with engine.begin() as connection:
+        rows = connection.execute(
+            select(table.c.id, table.c.round_number).order_by(table.c.round_number, table.c.id)
+        ).all()
+        
+        seen = set()
+        next_number = max((row.round_number for row in rows), default=0)
+        for row in rows:
+            if row.round_number not in seen:
+                seen.add(row.round_number)
+                continue
+            
+            next_number += 1
+            connection.execute(
+                table.update().where(table.c.id == row.id).values(round_number=next_number)
+            )
+            logger.warning(f"Renumbered duplicate aggregation round {row.round_number} (id {row.id}) to {next_number}")
+        
+        _create_missing_indexes(connection, table, {'ux_ar_round_number'})
+    return True
+
+
+# Applied in order
+MIGRATIONS = (
+    model_update_binary,
+    query_indexes,
+    unique_round_numbers,
+)
+
+
+def run_migrations(engine):
+    """Apply every pending migration"""
+    for migration in MIGRATIONS:
+        if migration(engine):
+            logger.info(f"Applied migration {migration.__name__}")
+        else:
+            logger.info(f"Migration {migration.__name__} has nothing to apply")
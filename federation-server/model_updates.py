@@ -0,0 +1,129 @@
+"""
+Model Updates
+Storage format and federated averaging of the model updates sent by edge
+devices. federated_average replaces FederatedAggregator.aggregate_model_updates:
+each global model is a dict with 'weights' (the averaged tensors as nested
+lists, keyed or ordered like the device updates) and 'samples_count' (total
+samples behind them).
+"""
+
+import io
+import json
+import collections
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def pack_model_update(update_data: Dict) -> bytes:
+    """Serialize a model update as an .npz archive
+    
+    Weights (a list of layer arrays or a dict of named arrays) are stored as
+    binary arrays; the remaining fields are kept as a JSON string.
+    """
+    weights = update_data.get('weights', [])
+    if isinstance(weights, dict):
+        arrays = {f'weights/{name}': np.asarray(w) for name, w in weights.items()}
+    else:
+        arrays = {f'weights:{i}': np.asarray(w) for i, w in enumerate(weights)}
+    
+    meta = {key: value for key, value in update_data.items() if key != 'weights'}
+    arrays['meta'] = np.array(json.dumps(meta))
+    
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def unpack_model_update(blob: bytes) -> Dict:
+    """Load a model update stored by pack_model_update
+    
+    Rows written before updates were stored as .npz archives hold JSON text,
+    which is parsed as JSON instead.
+    """
+    if isinstance(blob, str) or not blob.startswith(b'PK'):
+        return json.loads(blob)
+    
+    with np.load(io.BytesIO(blob), allow_pickle=False) as archive:
+        update_data = json.loads(archive['meta'].item())
+        
+        names = [name for name in archive.files if name != 'meta']
+        if any(name.startswith('weights/') for name in names):
+            update_data['weights'] = {name[len('weights/'):]: archive[name] for name in names}
+        else:
+            names.sort(key=lambda name: int(name[len('weights:'):]))
+            update_data['weights'] = [archive[name] for name in names]
+    
+    return update_data
+
+
+def _weights_layout(weights: Any) -> Optional[tuple]:
+    """(key, shape) pairs describing a weights list or dict
+    
+    None if there are no weights or a layer is ragged (nested lists of uneven
+    length have no shape), so such updates never match a usable layout.
+    """
+    if not weights:
+        return None
+    
+    items = sorted(weights.items()) if isinstance(weights, dict) else enumerate(weights)
+    layout = []
+    for key, layer in items:
+        try:
+            layout.append((key, np.shape(layer)))
+        except ValueError:
+            return None
+    return tuple(layout)
+
+
+def federated_average(updates: List[Dict]) -> Optional[Dict]:
+    """Sample-weighted FedAvg of each weight tensor across device updates
+    
+    Every update must carry the same weight layout: a list of layer arrays, or
+    a dict of named arrays, with matching keys and shapes. The layout shared by
+    most updates is averaged; devices whose weights don't match it (or are
+    empty or ragged) are skipped with a warning rather than failing the round.
+    
+    Args:
+        updates: Updates for one model, as built in start_aggregation_round
+    
+    Returns:
+        Global model with JSON-serializable averaged weights, or None if there
+        are no weights to average
+    """
+    layouts = [_weights_layout(update['update_data'].get('weights')) for update in updates]
+    common = collections.Counter(layout for layout in layouts if layout).most_common(1)
+    if not common:
+        return None
+    layout = common[0][0]
+    
+    skipped = [update['device_id'] for update, other in zip(updates, layouts) if other != layout]
+    if skipped:
+        logger.warning(f"Skipping {len(skipped)} updates with mismatched or ragged weights: {skipped}")
+        updates = [update for update, other in zip(updates, layouts) if other == layout]
+    layers = updates[0]['update_data']['weights']
+    
+    # Weight each device by its sample count (equal weights if none are reported)
+    samples = np.array([update['samples_count'] or 0 for update in updates], dtype=np.float64)
+    total = samples.sum()
+    if total > 0:
+        coeffs = samples / total
+    else:
+        coeffs = np.full(len(updates), 1.0 / len(updates))
+    
+    keys = list(layers.keys()) if isinstance(layers, dict) else list(range(len(layers)))
+    averaged = []
+    for key in keys:
+        stacked = np.stack([update['update_data']['weights'][key] for update in updates])
+        
+        # Weighted sum as one BLAS matrix-vector product over the flattened (K, N) stack
+        weighted = coeffs @ stacked.reshape(len(updates), -1)
+        averaged.append(weighted.reshape(stacked.shape[1:]).tolist())
+    
+    return {
+        'weights': dict(zip(keys, averaged)) if isinstance(layers, dict) else averaged,
+        'samples_count': int(samples.sum())
+    }
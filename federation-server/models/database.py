@@ -0,0 +1,64 @@
+"""
+Database Models
+SQLAlchemy models for edge devices, model updates and aggregation rounds
+"""
+
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+# Lengths above 16 MiB make MySQL pick LONGBLOB/LONGTEXT; other dialects ignore them
+LONG_COLUMN = 2**32 - 1
+
+
+class Device(db.Model):
+    """Registered edge device"""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(128), unique=True, nullable=False)
+    device_type = db.Column(db.String(64), default='edge')
+    capabilities = db.Column(db.Text)  # JSON object
+    location = db.Column(db.String(255))
+    status = db.Column(db.String(32), default='active', index=True)
+    registered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_seen = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ModelUpdate(db.Model):
+    """Model weight update sent by a device for one model"""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(128), nullable=False)
+    model_name = db.Column(db.String(128), nullable=False)
+    update_data = db.Column(db.LargeBinary(length=LONG_COLUMN), nullable=False)  # .npz archive
+    samples_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    aggregated = db.Column(db.Boolean, default=False, nullable=False)
+    
+    __table_args__ = (
+        # Pending updates query in start_aggregation_round
+        db.Index('ix_mu_created_agg', created_at, aggregated),
+    )
+
+
+class AggregationRound(db.Model):
+    """One federated averaging round and its resulting global models"""
+    
+    id = db.Column(db.Integer, primary_key=True)
+    round_number = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(32), nullable=False)  # in_progress, completed, failed
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    completed_at = db.Column(db.DateTime)
+    global_models = db.Column(db.Text(length=LONG_COLUMN))  # JSON object
+    participating_devices = db.Column(db.Integer, default=0)
+    error_message = db.Column(db.Text)
+    
+    __table_args__ = (
+        # Latest completed round lookup in download_global_models
+        db.Index('ix_ar_status_completed', status, completed_at.desc()),
+        # Concurrent aggregation tasks can compute the same next round number;
+        # the loser's insert fails and it retries with a fresh number
+        db.Index('ux_ar_round_number', round_number, unique=True),
+    )
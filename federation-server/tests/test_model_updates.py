@@ -0,0 +1,128 @@
+"""
+Tests for model update storage and federated averaging
+"""
+
+import json
+
+import numpy as np
+
+from model_updates import federated_average, pack_model_update, unpack_model_update
+
+
+def make_update(device_id, weights, samples_count):
+    """Update in the shape start_aggregation_round builds"""
+    return {
+        'device_id': device_id,
+        'update_data': {'weights': weights},
+        'samples_count': samples_count
+    }
+
+
+def test_weighted_by_samples_count():
+    updates = [
+        make_update('a', [np.array([[1.0, 2.0], [3.0, 4.0]]), np.array([10.0])], 1),
+        make_update('b', [np.array([[5.0, 6.0], [7.0, 8.0]]), np.array([20.0])], 3),
+    ]
+    
+    result = federated_average(updates)
+    
+    # (1 * a + 3 * b) / 4, worked out by hand
+    np.testing.assert_allclose(result['weights'][0], [[4.0, 5.0], [6.0, 7.0]])
+    np.testing.assert_allclose(result['weights'][1], [17.5])
+    assert result['samples_count'] == 4
+
+
+def test_named_weights_keep_their_keys():
+    updates = [
+        make_update('a', {'dense': np.array([2.0, 4.0]), 'bias': [1.0]}, 2),
+        make_update('b', {'bias': [4.0], 'dense': np.array([8.0, 10.0])}, 1),
+    ]
+    
+    result = federated_average(updates)
+    
+    np.testing.assert_allclose(result['weights']['dense'], [4.0, 6.0])
+    np.testing.assert_allclose(result['weights']['bias'], [2.0])
+    assert result['samples_count'] == 3
+
+
+def test_equal_weights_without_sample_counts():
+    updates = [
+        make_update('a', [[1.0, 3.0]], None),
+        make_update('b', [[3.0, 5.0]], 0),
+    ]
+    
+    result = federated_average(updates)
+    
+    np.testing.assert_allclose(result['weights'][0], [2.0, 4.0])
+    assert result['samples_count'] == 0
+
+
+def test_mismatched_shapes_are_skipped():
+    updates = [
+        make_update('a', [[1.0, 1.0]], 1),
+        make_update('b', [[3.0, 3.0]], 1),
+        make_update('c', [[9.0, 9.0, 9.0]], 5),
+    ]
+    
+    result = federated_average(updates)
+    
+    np.testing.assert_allclose(result['weights'][0], [2.0, 2.0])
+    assert result['samples_count'] == 2
+
+
+def test_ragged_layers_are_skipped():
+    updates = [
+        make_update('a', [[[1.0, 2.0], [3.0, 4.0]]], 1),
+        make_update('b', [[[3.0, 4.0], [5.0, 6.0]]], 1),
+        make_update('c', [[[1.0, 2.0], [3.0]]], 1),
+    ]
+    
+    result = federated_average(updates)
+    
+    np.testing.assert_allclose(result['weights'][0], [[2.0, 3.0], [4.0, 5.0]])
+    assert result['samples_count'] == 2
+
+
+def test_no_weights_returns_none():
+    assert federated_average([make_update('a', [], 1), make_update('b', {}, 1)]) is None
+
+
+def test_pack_unpack_round_trip_list_weights():
+    update_data = {
+        'weights': [np.arange(6, dtype=np.float32).reshape(2, 3), np.array([0.5])],
+        'samples_count': 12,
+        'model_version': 'v3'
+    }
+    
+    restored = unpack_model_update(pack_model_update(update_data))
+    
+    assert restored['samples_count'] == 12
+    assert restored['model_version'] == 'v3'
+    assert len(restored['weights']) == 2
+    np.testing.assert_array_equal(restored['weights'][0], update_data['weights'][0])
+    assert restored['weights'][0].dtype == np.float32
+    np.testing.assert_array_equal(restored['weights'][1], [0.5])
+
+
+def test_pack_unpack_keeps_layer_order_past_ten():
+    update_data = {'weights': [np.full(2, i, dtype=np.float64) for i in range(12)]}
+    
+    restored = unpack_model_update(pack_model_update(update_data))
+    
+    assert [layer[0] for layer in restored['weights']] == list(range(12))
+
+
+def test_pack_unpack_round_trip_named_weights():
+    update_data = {'weights': {'dense/kernel': np.ones((2, 2)), 'dense/bias': np.zeros(2)}}
+    
+    restored = unpack_model_update(pack_model_update(update_data))
+    
+    assert set(restored['weights']) == {'dense/kernel', 'dense/bias'}
+    np.testing.assert_array_equal(restored['weights']['dense/kernel'], np.ones((2, 2)))
+
+
+def test_unpack_legacy_json_rows():
+    legacy = {'weights': [[1.0, 2.0]], 'samples_count': 4}
+    
+    assert unpack_model_update(json.dumps(legacy)) == legacy
+    assert unpack_model_update(json.dumps(legacy).encode('utf-8')) == legacy
@@ -7,13 +7,24 @@ import pulumi
 import pulumi_aws as aws
 import pulumi_random as random
 import json
-from typing import Dict, Any
 
 # Get configuration
 config = pulumi.Config()
 environment = config.get("environment", "development")
 project_name = "health-monitoring"
 
+# Environment-specific sizing; a stack can override any key through the
+# "sizing" config object (pulumi config set --path sizing.rds_instance_class ...)
+is_development = environment == "development"
+sizing = {
+    "rds_instance_class": "db.t3.micro" if is_development else "db.r5.large",
+    "redis_node_type": "cache.t3.micro" if is_development else "cache.r6g.large",
+    "log_retention_days": 7 if is_development else 30,
+    "skip_final_snapshot": is_development,
+    "deletion_protection": environment == "production"
+}
+sizing.update(config.get_object("sizing") or {})
+
 # Create tags for all resources
 common_tags = {
     "Project": project_name,
@@ -21,57 +32,125 @@ common_tags = {
     "ManagedBy": "Pulumi"
 }
 
+
+# Explicit AWS provider: skips the configure-time metadata, STS and region
+# probes and gives throttled Describe* calls during refresh a larger retry budget
+aws_provider = aws.Provider(
+    "aws",
+    region=aws.config.region or "us-west-2",
+    skip_metadata_api_check=True,
+    skip_credentials_validation=True,
+    skip_region_validation=True,
+    max_retries=25
+)
+
+
+def use_aws_provider(args: pulumi.ResourceTransformationArgs) -> pulumi.ResourceTransformationResult:
+    """Stack transformation routing every resource through aws_provider"""
+    return pulumi.ResourceTransformationResult(
+        props=args.props,
+        opts=pulumi.ResourceOptions.merge(args.opts, pulumi.ResourceOptions(provider=aws_provider))
+    )
+
+
+pulumi.runtime.register_stack_transformation(use_aws_provider)
+
+
+def tag(name: str) -> dict[str, str]:
+    """Common tags plus a Name tag"""
+    tags = common_tags.copy()
+    tags["Name"] = name
+    return tags
+
+
+def assume_role_policy(service: str) -> str:
+    """IAM trust policy allowing an AWS service to assume a role"""
+    return json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Action": "sts:AssumeRole",
+            "Effect": "Allow",
+            "Principal": {
+                "Service": service
+            }
+        }]
+    })
+
+
+# IAM policy documents, serialized once
+ecs_trust_policy = assume_role_policy("ecs-tasks.amazonaws.com")
+lambda_trust_policy = assume_role_policy("lambda.amazonaws.com")
+
+iot_policy_document = json.dumps({
+    "Version": "2012-10-17",
+    "Statement": [{
+        "Effect": "Allow",
+        "Action": [
+            "iot:Connect",
+            "iot:Publish",
+            "iot:Subscribe",
+            "iot:Receive"
+        ],
+        "Resource": "*"
+    }]
+})
+
+# S3 access policy for the model bucket, formatted with the bucket ARN as {0}
+s3_policy_template = (
+    '{{"Version": "2012-10-17", "Statement": [{{'
+    '"Effect": "Allow", "Action": ["s3:GetObject", "s3:PutObject", "s3:DeleteObject"], '
+    '"Resource": "{0}/*"}}, {{'
+    '"Effect": "Allow", "Action": ["s3:ListBucket"], '
+    '"Resource": "{0}"}}]}}'
+)
+
+
 # Create VPC and networking
 vpc = aws.ec2.Vpc(
     f"{project_name}-vpc",
     cidr_block="10.0.0.0/16",
     enable_dns_hostnames=True,
     enable_dns_support=True,
-    tags={**common_tags, "Name": f"{project_name}-vpc"}
+    tags=tag(f"{project_name}-vpc")
 )
 
 # Create internet gateway
 igw = aws.ec2.InternetGateway(
     f"{project_name}-igw",
     vpc_id=vpc.id,
-    tags={**common_tags, "Name": f"{project_name}-igw"}
+    tags=tag(f"{project_name}-igw")
 )
 
 # Create public subnets
-public_subnet_1 = aws.ec2.Subnet(
-    f"{project_name}-public-subnet-1",
-    vpc_id=vpc.id,
-    cidr_block="10.0.1.0/24",
-    availability_zone="us-west-2a",
-    map_public_ip_on_launch=True,
-    tags={**common_tags, "Name": f"{project_name}-public-subnet-1"}
-)
-
-public_subnet_2 = aws.ec2.Subnet(
-    f"{project_name}-public-subnet-2",
-    vpc_id=vpc.id,
-    cidr_block="10.0.2.0/24",
-    availability_zone="us-west-2b",
-    map_public_ip_on_launch=True,
-    tags={**common_tags, "Name": f"{project_name}-public-subnet-2"}
-)
+public_subnet_1, public_subnet_2 = [
+    aws.ec2.Subnet(
+        f"{project_name}-public-subnet-{index}",
+        vpc_id=vpc.id,
+        cidr_block=cidr_block,
+        availability_zone=availability_zone,
+        map_public_ip_on_launch=True,
+        tags=tag(f"{project_name}-public-subnet-{index}")
+    )
+    for index, cidr_block, availability_zone in (
+        (1, "10.0.1.0/24", "us-west-2a"),
+        (2, "10.0.2.0/24", "us-west-2b")
+    )
+]
 
 # Create private subnets
-private_subnet_1 = aws.ec2.Subnet(
-    f"{project_name}-private-subnet-1",
-    vpc_id=vpc.id,
-    cidr_block="10.0.3.0/24",
-    availability_zone="us-west-2a",
-    tags={**common_tags, "Name": f"{project_name}-private-subnet-1"}
-)
-
-private_subnet_2 = aws.ec2.Subnet(
-    f"{project_name}-private-subnet-2",
-    vpc_id=vpc.id,
-    cidr_block="10.0.4.0/24",
-    availability_zone="us-west-2b",
-    tags={**common_tags, "Name": f"{project_name}-private-subnet-2"}
-)
+private_subnet_1, private_subnet_2 = [
+    aws.ec2.Subnet(
+        f"{project_name}-private-subnet-{index}",
+        vpc_id=vpc.id,
+        cidr_block=cidr_block,
+        availability_zone=availability_zone,
+        tags=tag(f"{project_name}-private-subnet-{index}")
+    )
+    for index, cidr_block, availability_zone in (
+        (1, "10.0.3.0/24", "us-west-2a"),
+        (2, "10.0.4.0/24", "us-west-2b")
+    )
+]
 
 # Create NAT gateway
 nat_eip = aws.ec2.Eip(f"{project_name}-nat-eip", domain="vpc")
@@ -80,20 +159,20 @@ nat_gateway = aws.ec2.NatGateway(
     f"{project_name}-nat-gateway",
     allocation_id=nat_eip.id,
     subnet_id=public_subnet_1.id,
-    tags={**common_tags, "Name": f"{project_name}-nat-gateway"}
+    tags=tag(f"{project_name}-nat-gateway")
 )
 
 # Create route tables
 public_route_table = aws.ec2.RouteTable(
     f"{project_name}-public-rt",
     vpc_id=vpc.id,
-    tags={**common_tags, "Name": f"{project_name}-public-rt"}
+    tags=tag(f"{project_name}-public-rt")
 )
 
 private_route_table = aws.ec2.RouteTable(
     f"{project_name}-private-rt",
     vpc_id=vpc.id,
-    tags={**common_tags, "Name": f"{project_name}-private-rt"}
+    tags=tag(f"{project_name}-private-rt")
 )
 
 # Create routes
@@ -112,31 +191,31 @@ aws.ec2.Route(
 )
 
 # Associate route tables with subnets
-aws.ec2.RouteTableAssociation(
-    f"{project_name}-public-rt-assoc-1",
-    subnet_id=public_subnet_1.id,
-    route_table_id=public_route_table.id
-)
-
-aws.ec2.RouteTableAssociation(
-    f"{project_name}-public-rt-assoc-2",
-    subnet_id=public_subnet_2.id,
-    route_table_id=public_route_table.id
-)
-
-aws.ec2.RouteTableAssociation(
-    f"{project_name}-private-rt-assoc-1",
-    subnet_id=private_subnet_1.id,
-    route_table_id=private_route_table.id
-)
-
-aws.ec2.RouteTableAssociation(
-    f"{project_name}-private-rt-assoc-2",
-    subnet_id=private_subnet_2.id,
-    route_table_id=private_route_table.id
-)
+for subnet, route_table, name in (
+    (public_subnet_1, public_route_table, "public-rt-assoc-1"),
+    (public_subnet_2, public_route_table, "public-rt-assoc-2"),
+    (private_subnet_1, private_route_table, "private-rt-assoc-1"),
+    (private_subnet_2, private_route_table, "private-rt-assoc-2")
+):
+    aws.ec2.RouteTableAssociation(
+        f"{project_name}-{name}",
+        subnet_id=subnet.id,
+        route_table_id=route_table.id
+    )
 
 # Create security groups
+# Rule inputs shared by several groups (Pulumi serializes inputs per resource)
+any_ipv4 = ["0.0.0.0/0"]
+
+allow_all_egress = [
+    aws.ec2.SecurityGroupEgressArgs(
+        protocol="-1",
+        from_port=0,
+        to_port=0,
+        cidr_blocks=any_ipv4
+    )
+]
+
 # Application Load Balancer security group
 alb_security_group = aws.ec2.SecurityGroup(
     f"{project_name}-alb-sg",
@@ -147,24 +226,17 @@ alb_security_group = aws.ec2.SecurityGroup(
             protocol="tcp",
             from_port=80,
             to_port=80,
-            cidr_blocks=["0.0.0.0/0"]
+            cidr_blocks=any_ipv4
         ),
         aws.ec2.SecurityGroupIngressArgs(
             protocol="tcp",
             from_port=443,
             to_port=443,
-            cidr_blocks=["0.0.0.0/0"]
+            cidr_blocks=any_ipv4
         )
     ],
-    egress=[
-        aws.ec2.SecurityGroupEgressArgs(
-            protocol="-1",
-            from_port=0,
-            to_port=0,
-            cidr_blocks=["0.0.0.0/0"]
-        )
-    ],
-    tags={**common_tags, "Name": f"{project_name}-alb-sg"}
+    egress=allow_all_egress,
+    tags=tag(f"{project_name}-alb-sg")
 )
 
 # ECS security group
@@ -186,15 +258,8 @@ ecs_security_group = aws.ec2.SecurityGroup(
             security_groups=[alb_security_group.id]
         )
     ],
-    egress=[
-        aws.ec2.SecurityGroupEgressArgs(
-            protocol="-1",
-            from_port=0,
-            to_port=0,
-            cidr_blocks=["0.0.0.0/0"]
-        )
-    ],
-    tags={**common_tags, "Name": f"{project_name}-ecs-sg"}
+    egress=allow_all_egress,
+    tags=tag(f"{project_name}-ecs-sg")
 )
 
 # RDS security group
@@ -210,7 +275,7 @@ rds_security_group = aws.ec2.SecurityGroup(
             security_groups=[ecs_security_group.id]
         )
     ],
-    tags={**common_tags, "Name": f"{project_name}-rds-sg"}
+    tags=tag(f"{project_name}-rds-sg")
 )
 
 # ElastiCache security group
@@ -226,7 +291,7 @@ redis_security_group = aws.ec2.SecurityGroup(
             security_groups=[ecs_security_group.id]
         )
     ],
-    tags={**common_tags, "Name": f"{project_name}-redis-sg"}
+    tags=tag(f"{project_name}-redis-sg")
 )
 
 # Create S3 bucket for model storage
@@ -257,10 +322,11 @@ aws.s3.BucketPublicAccessBlock(
 rds_subnet_group = aws.rds.SubnetGroup(
     f"{project_name}-rds-subnet-group",
     subnet_ids=[private_subnet_1.id, private_subnet_2.id],
-    tags={**common_tags, "Name": f"{project_name}-rds-subnet-group"}
+    tags=tag(f"{project_name}-rds-subnet-group")
 )
 
-# Generate random password for RDS
+# Generate the RDS password once (kept in stack state, so existing stacks keep
+# their current password) and store it in Secrets Manager for the services
 rds_password = random.RandomPassword(
     f"{project_name}-rds-password",
     length=16,
@@ -268,6 +334,17 @@ rds_password = random.RandomPassword(
     override_special="!#$%&*()-_=+[]{}<>:?"
 )
 
+rds_password_secret = aws.secretsmanager.Secret(
+    f"{project_name}-rds-password",
+    tags=common_tags
+)
+
+rds_password_version = aws.secretsmanager.SecretVersion(
+    f"{project_name}-rds-password-version",
+    secret_id=rds_password_secret.id,
+    secret_string=rds_password.result
+)
+
 # Create RDS instance
 rds_instance = aws.rds.Instance(
     f"{project_name}-mysql",
@@ -276,7 +353,7 @@ rds_instance = aws.rds.Instance(
     storage_type="gp2",
     engine="mysql",
     engine_version="8.0",
-    instance_class="db.t3.micro" if environment == "development" else "db.r5.large",
+    instance_class=sizing["rds_instance_class"],
     db_name="health_monitoring",
     username="admin",
     password=rds_password.result,
@@ -287,9 +364,9 @@ rds_instance = aws.rds.Instance(
     backup_window="03:00-04:00",
     maintenance_window="Mon:04:00-Mon:05:00",
     storage_encrypted=True,
-    skip_final_snapshot=environment == "development",
-    deletion_protection=environment == "production",
-    tags={**common_tags, "Name": f"{project_name}-mysql"}
+    skip_final_snapshot=sizing["skip_final_snapshot"],
+    deletion_protection=sizing["deletion_protection"],
+    tags=tag(f"{project_name}-mysql")
 )
 
 # Create ElastiCache subnet group
@@ -302,7 +379,7 @@ redis_subnet_group = aws.elasticache.SubnetGroup(
 redis_cluster = aws.elasticache.ReplicationGroup(
     f"{project_name}-redis",
     description="Redis cluster for health monitoring",
-    node_type="cache.t3.micro" if environment == "development" else "cache.r6g.large",
+    node_type=sizing["redis_node_type"],
     port=6379,
     parameter_group_name="default.redis7",
     num_cache_clusters=2,
@@ -324,16 +401,7 @@ ecs_cluster = aws.ecs.Cluster(
 # Create ECS execution role
 ecs_execution_role = aws.iam.Role(
     f"{project_name}-ecs-execution-role",
-    assume_role_policy=json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [{
-            "Action": "sts:AssumeRole",
-            "Effect": "Allow",
-            "Principal": {
-                "Service": "ecs-tasks.amazonaws.com"
-            }
-        }]
-    }),
+    assume_role_policy=ecs_trust_policy,
     tags=common_tags
 )
 
@@ -347,40 +415,14 @@ aws.iam.RolePolicyAttachment(
 # Create ECS task role
 ecs_task_role = aws.iam.Role(
     f"{project_name}-ecs-task-role",
-    assume_role_policy=json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [{
-            "Action": "sts:AssumeRole",
-            "Effect": "Allow",
-            "Principal": {
-                "Service": "ecs-tasks.amazonaws.com"
-            }
-        }]
-    }),
+    assume_role_policy=ecs_trust_policy,
     tags=common_tags
 )
 
 # Create policy for S3 access
 s3_policy = aws.iam.Policy(
     f"{project_name}-s3-policy",
-    policy=model_storage_bucket.arn.apply(lambda arn: json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [{
-            "Effect": "Allow",
-            "Action": [
-                "s3:GetObject",
-                "s3:PutObject",
-                "s3:DeleteObject"
-            ],
-            "Resource": f"{arn}/*"
-        }, {
-            "Effect": "Allow",
-            "Action": [
-                "s3:ListBucket"
-            ],
-            "Resource": arn
-        }]
-    }))
+    policy=pulumi.Output.format(s3_policy_template, model_storage_bucket.arn)
 )
 
 # Attach S3 policy to task role
@@ -393,7 +435,7 @@ aws.iam.RolePolicyAttachment(
 # Create CloudWatch log group
 log_group = aws.cloudwatch.LogGroup(
     f"{project_name}-logs",
-    retention_in_days=7 if environment == "development" else 30,
+    retention_in_days=sizing["log_retention_days"],
     tags=common_tags
 )
 
@@ -408,45 +450,31 @@ alb = aws.lb.LoadBalancer(
 )
 
 # Create target groups
-backend_target_group = aws.lb.TargetGroup(
-    f"{project_name}-backend-tg",
-    port=8080,
-    protocol="HTTP",
-    vpc_id=vpc.id,
-    target_type="ip",
-    health_check=aws.lb.TargetGroupHealthCheckArgs(
-        enabled=True,
-        healthy_threshold=2,
-        interval=30,
-        matcher="200",
-        path="/actuator/health",
-        port="traffic-port",
+def target_group(name: str, port: int, health_check_path: str) -> aws.lb.TargetGroup:
+    """HTTP target group for ECS tasks with the shared health check settings"""
+    return aws.lb.TargetGroup(
+        f"{project_name}-{name}-tg",
+        port=port,
         protocol="HTTP",
-        timeout=5,
-        unhealthy_threshold=2
-    ),
-    tags=common_tags
-)
+        vpc_id=vpc.id,
+        target_type="ip",
+        health_check=aws.lb.TargetGroupHealthCheckArgs(
+            enabled=True,
+            healthy_threshold=2,
+            interval=30,
+            matcher="200",
+            path=health_check_path,
+            port="traffic-port",
+            protocol="HTTP",
+            timeout=5,
+            unhealthy_threshold=2
+        ),
+        tags=common_tags
+    )
 
-federation_target_group = aws.lb.TargetGroup(
-    f"{project_name}-federation-tg",
-    port=5000,
-    protocol="HTTP",
-    vpc_id=vpc.id,
-    target_type="ip",
-    health_check=aws.lb.TargetGroupHealthCheckArgs(
-        enabled=True,
-        healthy_threshold=2,
-        interval=30,
-        matcher="200",
-        path="/health",
-        port="traffic-port",
-        protocol="HTTP",
-        timeout=5,
-        unhealthy_threshold=2
-    ),
-    tags=common_tags
-)
+
+backend_target_group = target_group("backend", 8080, "/actuator/health")
+federation_target_group = target_group("federation", 5000, "/health")
 
 # Create ALB listeners
 alb_listener = aws.lb.Listener(
@@ -487,20 +515,6 @@ iot_thing_type = aws.iot.ThingType(
 )
 
 # Create IoT policy
-iot_policy_document = json.dumps({
-    "Version": "2012-10-17",
-    "Statement": [{
-        "Effect": "Allow",
-        "Action": [
-            "iot:Connect",
-            "iot:Publish",
-            "iot:Subscribe",
-            "iot:Receive"
-        ],
-        "Resource": "*"
-    }]
-})
-
 iot_policy = aws.iot.Policy(
     f"{project_name}-iot-policy",
     name=f"{project_name}-iot-policy",
@@ -510,16 +524,7 @@ iot_policy = aws.iot.Policy(
 # Create Lambda function for IoT data processing
 lambda_role = aws.iam.Role(
     f"{project_name}-lambda-role",
-    assume_role_policy=json.dumps({
-        "Version": "2012-10-17",
-        "Statement": [{
-            "Action": "sts:AssumeRole",
-            "Effect": "Allow",
-            "Principal": {
-                "Service": "lambda.amazonaws.com"
-            }
-        }]
-    }),
+    assume_role_policy=lambda_trust_policy,
     tags=common_tags
 )
 
@@ -536,23 +541,8 @@ iot_lambda = aws.lambda_.Function(
     runtime="python3.9",
     role=lambda_role.arn,
     handler="index.handler",
-    code=pulumi.AssetArchive({
-        "index.py": pulumi.StringAsset("""
-import json
-import boto3
-
-def handler(event, context):
-    print(f"Received IoT event: {json.dumps(event)}")
-    
-    # Process IoT data here
-    # Forward to federation server or trigger alerts
-    
-    return {
-        'statusCode': 200,
-        'body': json.dumps('IoT data processed successfully')
-    }
-        """)
-    }),
+    # Packaged from a directory: Pulumi hashes the files and only uploads on change
+    code=pulumi.FileArchive("./iot_lambda"),
     tags=common_tags
 )
 
@@ -560,6 +550,7 @@ def handler(event, context):
 pulumi.export("vpc_id", vpc.id)
 pulumi.export("alb_dns_name", alb.dns_name)
 pulumi.export("rds_endpoint", rds_instance.endpoint)
+pulumi.export("rds_password_secret_arn", rds_password_secret.arn)
 pulumi.export("redis_endpoint", redis_cluster.primary_endpoint_address)
 pulumi.export("s3_bucket", model_storage_bucket.bucket)
 pulumi.export("ecs_cluster", ecs_cluster.name)
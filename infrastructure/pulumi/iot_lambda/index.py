@@ -0,0 +1,13 @@
+import json
+import boto3
+
+def handler(event, context):
+    print(f"Received IoT event: {json.dumps(event)}")
+    
+    # Process IoT data here
+    # Forward to federation server or trigger alerts
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps('IoT data processed successfully')
+    }